@@ -9,7 +9,7 @@ from owlready2 import ThingClass, ObjectPropertyClass, Restriction, EXACTLY, MIN
     World, sync_reasoner_pellet
 
 from simpler_core.rdf import make_n_triples_stream, extract_ontology_concepts, \
-    get_cardinality_restrictions, build_cardinality, merge_cardinalities
+    build_cardinality_restriction_index, build_cardinality, merge_cardinalities
 
 
 @dataclass
@@ -20,6 +20,8 @@ class ConversionSettings:
     force_link_on: Set[ThingClass] = field(default_factory=set)
     force_link_on_object_prop: Set[ObjectPropertyClass] = field(default_factory=set)
     exclude_concept: Set[ThingClass | DataPropertyClass | ObjectPropertyClass] = field(default_factory=set)
+    # see build_cardinality_restriction_index - built for the handled class only if not given
+    cardinality_restrictions: Dict[Tuple[ThingClass, object, object], List[Restriction]] | None = None
 
 
 def build_iterative_class_list(ontology: Ontology) -> List[ThingClass]:
@@ -141,12 +143,16 @@ def handle_prop_content(
         relevant_range_classes: List[ThingClass] | List[str],
         opt: ConversionSettings
 ):
-    general_restrictions = get_cardinality_restrictions(domain_class, prop, None)
+    restriction_index = opt.cardinality_restrictions
+    if restriction_index is None:
+        restriction_index = build_cardinality_restriction_index([domain_class])
+
+    general_restrictions = restriction_index.get((domain_class, prop, None), [])
     general_cardinality = build_cardinality(general_restrictions)
     all_cardinalities = [general_cardinality]
 
     for range_class in relevant_range_classes:
-        restrictions = get_cardinality_restrictions(domain_class, prop, range_class)
+        restrictions = restriction_index.get((domain_class, prop, range_class), [])
         specific_cardinality = build_cardinality(restrictions)
         all_cardinalities.append(specific_cardinality)
 
@@ -253,7 +259,7 @@ def main():
 
     target_folder.mkdir(exist_ok=True)
 
-    with (open(owl_file_path, 'r') as stream):
+    with (open(owl_file_path, 'rb') as stream):
         with make_n_triples_stream(stream) as n_triples_stream:
             stream_path_url = Path(n_triples_stream.name).as_uri().replace('///', '//')
             classes, object_properties, data_properties, world, ontologies = \
@@ -266,7 +272,8 @@ def main():
         link_uri_pattern='http://localhost:7373/schemata/[^/]+/entities/[^/]+',
         force_link_on={ontology['Entity']},
         force_link_on_object_prop={ontology['inverseRelation']},
-        exclude_concept={ontology['isAttributeOf']}
+        exclude_concept={ontology['isAttributeOf']},
+        cardinality_restrictions=build_cardinality_restriction_index(classes)
     )
 
     # only_base_iri_concepts = True
@@ -1,25 +1,42 @@
+import codecs
+import collections
+import itertools
+from array import array
 from collections.abc import Iterator
+import hashlib
+import os
+import re
+import shutil
 import sys
 import uuid
-from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, ExitStack
 from dataclasses import dataclass
-from io import BytesIO
-from tempfile import NamedTemporaryFile
-from typing import TextIO, IO, List, Tuple, Dict
+from io import BytesIO, UnsupportedOperation
+from pathlib import Path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import IO, List, Tuple, Dict, Set, Callable, Any
 
 import rdflib
+import rdflib.store
+import rdflib.util
 from owlready2 import World, Ontology, sync_reasoner_pellet, DataPropertyClass, ObjectPropertyClass, ThingClass, \
-    EXACTLY, MAX, MIN, Restriction
+    EXACTLY, MAX, MIN, Restriction, Or, And, Not
 from pydantic import BaseModel
-from rdflib import Graph, Namespace, Literal, RDF, OWL, URIRef, RDFS, BNode
+from rdflib import Graph, Dataset, Namespace, Literal, RDF, OWL, URIRef, RDFS, BNode
 
 from simpler_core.cardinality import merge_cardinalities
+from simpler_core.settings import Settings
+from simpler_core.storage import get_stream_file_path
 from simpler_model import Entity, Cardinality, RelationModifier, EntityModifier, AttributeModifier
 
 relevant_restrictions = {
     EXACTLY, MAX, MIN
 }
 
+# The reasoning results are asserted into this ontology, so they can be stored and loaded separately
+inferences_ontology_iri = 'http://simpler/inferences/'
+
 
 @dataclass
 class SerializationContext:
@@ -43,19 +60,112 @@ def build_iterative_class_list(ontology: Ontology | World) -> List[ThingClass]:
     return list(class_set)
 
 
-def extract_ontology_concepts(n_triples_streams: List[Tuple[IO, str]]) -> Tuple[
+def hash_stream_content(stream: IO[bytes]) -> str:
+    # Hashes the remaining content of the stream and rewinds it to the previous position afterward
+    position = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+def _store_cache_file(cache_file_path: Path, write_content):
+    # Written to a temp file first, so concurrent requests never read a partially written cache file
+    with NamedTemporaryFile(dir=cache_file_path.parent, delete=False) as temp_stream:
+        write_content(temp_stream)
+    os.replace(temp_stream.name, cache_file_path)
+
+
+def _apply_reasoning(world: World, cache_key: str, cache_path: Path | None):
+    inferences = world.get_ontology(inferences_ontology_iri)
+    inferences_path = None if cache_path is None else cache_path / f'{cache_key}.inferences.nt'
+    if inferences_path is not None and inferences_path.is_file():
+        # Pellet runs in a JVM and takes minutes for large ontologies, so its results are reused for the same content
+        with open(inferences_path, 'rb') as stream:
+            inferences.load(fileobj=stream)
+        return
+
+    with inferences:
+        sync_reasoner_pellet(world)
+    if inferences_path is not None:
+        cache_path.mkdir(parents=True, exist_ok=True)
+        _store_cache_file(inferences_path, lambda stream: inferences.save(file=stream, format='ntriples'))
+
+
+def _store_world(world: World, world_path: Path):
+    # Moving the in memory world to a new file clones its quadstore. It is opened once writable afterward,
+    #  so owlready completes the ontology records and later read only opens do not need to write.
+    temp_path = world_path.with_name(f'{world_path.name}.{uuid.uuid4().hex}.tmp')
+    world.set_backend(filename=str(temp_path))
+    world.save()
+    world.close()
+    completed_world = World(filename=str(temp_path), exclusive=False)
+    completed_world.save()
+    completed_world.close()
+    os.replace(temp_path, world_path)
+
+
+def _open_stored_world(world_path: Path, read_only: bool) -> Tuple[World, List[Ontology]]:
+    world = World(filename=str(world_path), exclusive=False, read_only=read_only)
+    ontologies = [
+        ontology
+        for base_iri, ontology in world.ontologies.items()
+        if base_iri not in ('http://anonymous/', inferences_ontology_iri)
+    ]
+    return world, ontologies
+
+
+@contextmanager
+def _open_load_stream(stream: IO[bytes]) -> Iterator[IO[bytes]]:
+    # owlready2 closes the file object after loading - the stream stays usable for the caller by loading a second file
+    #  object on the same file descriptor. Streams without one (e.g. BytesIO) are loaded from a copy of their content.
+    stream.seek(0)
+    try:
+        file_descriptor = stream.fileno()
+    except (AttributeError, UnsupportedOperation):
+        yield BytesIO(stream.read())
+        return
+    with open(file_descriptor, 'rb', closefd=False) as load_stream:
+        yield load_stream
+
+
+def extract_ontology_concepts(
+        n_triples_streams: List[Tuple[IO, str]],
+        cache_path: Path | None = None,
+        read_only: bool = True,
+        content_hashes: List[str] | None = None
+) -> Tuple[
     List[ThingClass],
     List[ObjectPropertyClass],
     List[DataPropertyClass],
     World,
     List[Ontology]
 ]:
-    world = World()
-    ontologies = []
-    for n_triples_stream, ontology_base_url in n_triples_streams:
-        ontologies.append(world.get_ontology(ontology_base_url).load(fileobj=n_triples_stream))
-
-    sync_reasoner_pellet(world)
+    # Converted N-Triples contain generated blank node labels, so callers pass the hashes of their raw input to get
+    #  the same cache key for the same content
+    if content_hashes is None:
+        content_hashes = [hash_stream_content(n_triples_stream) for n_triples_stream, _ in n_triples_streams]
+    cache_key = hashlib.sha256(''.join(content_hashes).encode('utf-8')).hexdigest()
+
+    # With a cache the loaded and reasoned quadstore is kept as SQLite file, so requests for unchanged content skip
+    #  the parsing, loading and reasoning. Without write access, concurrent requests can share the file.
+    world_path = None if cache_path is None else cache_path / f'{cache_key}.sqlite3'
+    if world_path is not None and world_path.is_file():
+        world, ontologies = _open_stored_world(world_path, read_only)
+    else:
+        world = World()
+        ontologies = []
+        for n_triples_stream, ontology_base_url in n_triples_streams:
+            with _open_load_stream(n_triples_stream) as load_stream:
+                ontologies.append(world.get_ontology(ontology_base_url).load(fileobj=load_stream))
+            n_triples_stream.seek(0)
+
+        _apply_reasoning(world, cache_key, cache_path)
+        if world_path is not None:
+            cache_path.mkdir(parents=True, exist_ok=True)
+            _store_world(world, world_path)
+            world, ontologies = _open_stored_world(world_path, read_only)
 
     classes = sorted(build_iterative_class_list(world), key=lambda x: x.name)
     data_properties = sorted(world.data_properties(), key=lambda x: x.name)
@@ -64,16 +174,368 @@ def extract_ontology_concepts(n_triples_streams: List[Tuple[IO, str]]) -> Tuple[
     return classes, object_properties, data_properties, world, ontologies
 
 
-@contextmanager
-def make_n_triples_stream(rdf_like_stream: TextIO) -> Iterator[IO]:
+# Matches the lines of an N-Triples document (triples, comments and empty lines) without validating the IRIs
+n_triples_line_pattern = re.compile(
+    rb'\s*(?:(?:<[^>]*>|_:\S+)\s*<[^>]*>\s*(?:<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+    rb'\s*\.)?\s*(?:#.*)?'
+)
+
+
+# Matches the statements of an N-Quads document, which are N-Triples statements with an optional graph name
+n_quads_statement_pattern = re.compile(
+    rb'\s*(?:<[^>]*>|_:\S+)\s*<[^>]*>\s*(?:<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+    rb'\s*(?:<[^>]*>|_:\S+)?\s*\.\s*(?:#.*)?'
+)
+
+rdf_sniff_size = 64 * 1024  # bytes read to detect the format of RDF input without a known file extension
+
+# The formats with one statement per line, which can be split into chunks at any line break
+line_based_rdf_formats = {'nt', 'nquads'}
+
+
+def _get_line_chunks(path: str, chunk_size: int) -> List[Tuple[int, int]]:
+    # Splits the file into byte ranges that each end after a line break
+    file_size = os.path.getsize(path)
+    chunks = []
+    start = 0
+    with open(path, 'rb') as stream:
+        while start < file_size:
+            stream.seek(min(start + chunk_size, file_size))
+            stream.readline()
+            chunks.append((start, stream.tell()))
+            start = stream.tell()
+    return chunks
+
+
+def _map_line_chunks(function: Callable[..., Any], stream: IO[bytes], *args: Any) -> Iterator[Any]:
+    # Calls function(path, start, end, *args) per chunk of the stream and yields the results in the order of the
+    #  chunks. Multiple chunks are handled by worker processes, so the results are produced while they are consumed
+    settings = Settings()
+    with get_stream_file_path(stream) as path:
+        chunks = _get_line_chunks(path, settings.rdf_chunk_size)
+        if len(chunks) <= 1 or settings.rdf_max_workers == 1:
+            for start, end in chunks:
+                yield function(path, start, end, *args)
+            return
+        executor = ProcessPoolExecutor(settings.rdf_max_workers)
+        try:
+            yield from executor.map(
+                function,
+                itertools.repeat(path),
+                [start for start, _ in chunks],
+                [end for _, end in chunks],
+                *[itertools.repeat(arg) for arg in args]
+            )
+        finally:
+            # Consumers stop early e.g. once a chunk is not N-Triples, the chunks that did not start are dropped then
+            executor.shutdown(cancel_futures=True)
+
+
+def _read_chunk(path: str, start: int, end: int) -> bytes:
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        return stream.read(end - start)
+
+
+def _is_n_triples_chunk(path: str, start: int, end: int) -> bool:
+    # Runs in the worker processes
+    lines = _read_chunk(path, start, end).splitlines()
+    return all(n_triples_line_pattern.fullmatch(line) for line in lines)
+
+
+def is_n_triples_stream(stream: IO[bytes]) -> bool:
+    # Other formats fail on their first line with directives or prefixed names, so only N-Triples are read fully - in
+    #  parallel chunks for large files
+    position = stream.tell()
+    try:
+        if _sniff_rdf_format(stream) != 'nt':
+            return False
+        return all(_map_line_chunks(_is_n_triples_chunk, stream))
+    finally:
+        stream.seek(position)
+
+
+# Persistent stores hold the parsed input in this named graph, so it is found again when the store is reopened
+parsed_graph_iri = 'http://simpler/parsed/'
+
+
+def _create_rdf_store(store: str) -> rdflib.store.Store:
+    # The persistent stores are optional dependencies, so they are only imported on demand
+    if store == 'oxigraph':
+        from oxrdflib import OxigraphStore
+        return OxigraphStore()
+    if store == 'berkeleydb':
+        from rdflib.plugins.stores.berkeleydb import BerkeleyDB
+        return BerkeleyDB()
+    raise ValueError(f'Unsupported RDF store "{store}"')
+
+
+def _sniff_rdf_format(stream: IO[bytes]) -> str:
+    # Guesses the format from the start of the content - the last line read may be cut off, so it is not checked
+    position = stream.tell()
+    head = stream.read(rdf_sniff_size)
+    stream.seek(position)
+    is_cut_off = len(head) == rdf_sniff_size
+    head = head.removeprefix(codecs.BOM_UTF8)
+    content = head.lstrip()
+    if content.startswith((b'<?xml', b'<!DOCTYPE', b'<rdf:RDF')):
+        return 'xml'
+    # turtle documents may start with a blank node in square brackets, but not with an object in them
+    if content.startswith(b'{') or re.match(rb'\[\s*\{', content):
+        return 'json-ld'
+    lines = head.splitlines()[:-1] if is_cut_off else head.splitlines()
+    if all(n_triples_line_pattern.fullmatch(x) for x in lines):
+        # documents with nothing but comments are valid N-Triples
+        return 'turtle' if is_cut_off and not lines else 'nt'
+    if all(n_quads_statement_pattern.fullmatch(x) or n_triples_line_pattern.fullmatch(x) for x in lines):
+        return 'nquads'
+    return 'turtle'
+
+
+def _guess_rdf_format(stream: IO[bytes]) -> str:
+    # By the file extension like Graph.parse of rdflib, streams without a known extension are sniffed. N-Triples are
+    #  passed on by make_n_triples_stream, so content that only starts like N-Triples is parsed as turtle, which is a
+    #  superset of N-Triples
+    name = getattr(stream, 'name', None)
+    if isinstance(name, str) and rdflib.util.guess_format(name):
+        return rdflib.util.guess_format(name)
+    rdf_format = _sniff_rdf_format(stream)
+    return 'turtle' if rdf_format == 'nt' else rdf_format
+
+
+def _get_base_iri(stream: IO[bytes]) -> str | None:
+    # Relative IRIs are resolved against the file like rdflib does
+    name = getattr(stream, 'name', None)
+    return Path(name).absolute().as_uri() if isinstance(name, str) else None
+
+
+class _LabelPreservingBNodeContext(dict):
+    # The line based parsers of rdflib rename blank nodes per document, this keeps the labels instead, so the blank
+    #  nodes of separately parsed chunks still match
+    def get(self, key, default=None):
+        return key
+
+
+def _write_n_triples(source: IO[bytes] | bytes, rdf_format: str, destination: IO[bytes], base_iri: str | None = None):
+    # Statements of named graphs are merged into the default graph
+    try:
+        import pyoxigraph
+    except ImportError:
+        pyoxigraph = None
+    # Formats the installed pyoxigraph does not know (e.g. JSON-LD before 0.5) are parsed with rdflib instead
+    oxigraph_format_names = {
+        'nt': 'N_TRIPLES', 'nquads': 'N_QUADS', 'turtle': 'TURTLE', 'trig': 'TRIG', 'n3': 'N3', 'xml': 'RDF_XML',
+        'json-ld': 'JSON_LD'
+    }
+    oxigraph_format_type = getattr(pyoxigraph, 'RdfFormat', None)
+    oxigraph_formats = {
+        rdf_format: getattr(oxigraph_format_type, format_name)
+        for rdf_format, format_name in oxigraph_format_names.items()
+        if hasattr(oxigraph_format_type, format_name)
+    }
+    if rdf_format in oxigraph_formats:
+        # The parser of Oxigraph streams the statements, so the document is never held in memory
+        quads = pyoxigraph.parse(source, format=oxigraph_formats[rdf_format], base_iri=base_iri)
+        pyoxigraph.serialize((quad.triple for quad in quads), destination, pyoxigraph.RdfFormat.N_TRIPLES)
+        return
+
+    dataset = Dataset(default_union=True)
+    parse_arguments = {'bnode_context': _LabelPreservingBNodeContext()} if rdf_format in line_based_rdf_formats else {}
+    if isinstance(source, bytes):
+        dataset.parse(data=source, format=rdf_format, publicID=base_iri, **parse_arguments)
+    else:
+        dataset.parse(source, format=rdf_format, publicID=base_iri, **parse_arguments)
     graph = Graph()
-    graph.parse(rdf_like_stream)
-    with NamedTemporaryFile('w', newline='', delete_on_close=False, encoding='utf-8') as stream:
-        # stream_path_url = Path(stream.name).as_uri().replace('///', '//')
-        stream.write(graph.serialize(format='ntriples'))
-        stream.close()
-        with open(stream.name, 'rb') as binary_stream:
+    for subject, predicate, object_, _ in dataset.quads((None, None, None, None)):
+        graph.add((subject, predicate, object_))
+    _serialize_n_triples(graph, destination, 'memory')
+
+
+def _convert_line_chunk(path: str, start: int, end: int, rdf_format: str, base_iri: str | None) -> bytes:
+    # Runs in the worker processes
+    destination = BytesIO()
+    _write_n_triples(_read_chunk(path, start, end), rdf_format, destination, base_iri)
+    return destination.getvalue()
+
+
+def _convert_to_n_triples(rdf_like_stream: IO[bytes], destination: IO[bytes]):
+    # Line based formats are converted in parallel chunks that are appended in order, other formats are streamed
+    rdf_format = _guess_rdf_format(rdf_like_stream)
+    base_iri = _get_base_iri(rdf_like_stream)
+    if rdf_format in line_based_rdf_formats:
+        for content in _map_line_chunks(_convert_line_chunk, rdf_like_stream, rdf_format, base_iri):
+            destination.write(content)
+    else:
+        _write_n_triples(rdf_like_stream, rdf_format, destination, base_iri)
+
+
+def _serialize_n_triples(graph: Graph, stream: IO[bytes], store: str):
+    # The serializers write triple by triple, so the document never exists as a string in memory
+    n_triples_format = 'ox-ntriples' if store == 'oxigraph' else 'ntriples'
+    graph.serialize(destination=stream, format=n_triples_format, encoding='utf-8')
+
+
+@contextmanager
+def open_rdf_graph(
+        rdf_like_stream: IO[bytes],
+        store: str = 'memory',
+        cache_path: Path | None = None,
+        content_hash: str | None = None
+) -> Iterator[Graph]:
+    rdf_format = _guess_rdf_format(rdf_like_stream)
+    if store == 'memory':
+        graph = Graph()
+        graph.parse(rdf_like_stream, format=rdf_format)
+        yield graph
+        return
+
+    # Persistent stores are kept per content hash, so the input is only parsed once and can be queried afterward
+    with ExitStack() as stack:
+        if cache_path is None:
+            store_path = Path(stack.enter_context(TemporaryDirectory())) / store
+        else:
+            store_path = cache_path / f'{content_hash or hash_stream_content(rdf_like_stream)}.{store}'
+        if not store_path.exists():
+            store_path.parent.mkdir(parents=True, exist_ok=True)
+            # Parsed into a temp location first, so concurrent requests never open a partially loaded store
+            temp_path = store_path.with_name(f'{store_path.name}.{uuid.uuid4().hex}.tmp')
+            graph = Graph(store=_create_rdf_store(store), identifier=URIRef(parsed_graph_iri))
+            graph.open(str(temp_path), create=True)
+            try:
+                if store == 'oxigraph':
+                    # The native parsers of Oxigraph bulk load into the store without creating rdflib terms
+                    graph.parse(rdf_like_stream, format=f'ox-{rdf_format}', transactional=False)
+                else:
+                    graph.parse(rdf_like_stream, format=rdf_format)
+            finally:
+                graph.close()
+            try:
+                os.replace(temp_path, store_path)
+            except OSError:
+                # another request stored the same content in the meantime
+                shutil.rmtree(temp_path, ignore_errors=True)
+
+        graph = Graph(store=_create_rdf_store(store), identifier=URIRef(parsed_graph_iri))
+        graph.open(str(store_path))
+        try:
+            yield graph
+        finally:
+            graph.close()
+
+
+@contextmanager
+def make_n_triples_stream(
+        rdf_like_stream: IO[bytes],
+        cache_path: Path | None = None,
+        store: str = 'memory'
+) -> Iterator[IO[bytes]]:
+    # N-Triples can be loaded by owlready2 directly, so only other formats are parsed with rdflib
+    if is_n_triples_stream(rdf_like_stream):
+        yield rdf_like_stream
+        return
+
+    content_hash = None if cache_path is None else hash_stream_content(rdf_like_stream)
+    n_triples_path = None if cache_path is None else cache_path / f'{content_hash}.nt'
+    if n_triples_path is not None and n_triples_path.is_file():
+        with open(n_triples_path, 'rb') as binary_stream:
             yield binary_stream
+        return
+
+    with ExitStack() as stack:
+        if store == 'memory':
+            # Without a persistent store the input is converted directly instead of being parsed into a graph first
+            def write_n_triples(stream: IO[bytes]):
+                _convert_to_n_triples(rdf_like_stream, stream)
+        else:
+            graph = stack.enter_context(open_rdf_graph(rdf_like_stream, store, cache_path, content_hash))
+
+            def write_n_triples(stream: IO[bytes]):
+                _serialize_n_triples(graph, stream, store)
+
+        if n_triples_path is None:
+            binary_stream = stack.enter_context(NamedTemporaryFile(suffix='.nt'))
+            write_n_triples(binary_stream)
+            binary_stream.seek(0)
+            yield binary_stream
+            return
+
+        cache_path.mkdir(parents=True, exist_ok=True)
+        _store_cache_file(n_triples_path, write_n_triples)
+    with open(n_triples_path, 'rb') as binary_stream:
+        yield binary_stream
+
+
+# Matches N-Triples statements with an IRI or blank node as object, statements with literals are not relevant for the
+#  instance statistics
+n_triples_resource_statement_pattern = re.compile(rb'\s*(<[^>]*>|_:\S*[^\s.])\s*<([^>]*)>\s*(<[^>]*>|_:\S*[^\s.])')
+
+
+@dataclass
+class InstanceStatistics:
+    # The number of typed nodes per class and of statements per (subject class, property, object class) - all as IRIs
+    type_counts: Dict[str, int]
+    relation_counts: Dict[Tuple[str, str, str], int]
+
+
+def collect_instance_statistics(
+        n_triples_streams: List[IO[bytes]],
+        class_iris: List[str],
+        property_iris: List[str],
+        known_types: Dict[str, List[str]] | None = None
+) -> InstanceStatistics:
+    # Streams the statements once without loading them into a graph. Nodes are interned to integers and only the
+    #  statements of the given properties are buffered as integer arrays, because the types of their subjects and
+    #  objects may be stated later in the data
+    class_ids = {iri.encode('utf-8'): index for index, iri in enumerate(class_iris)}
+    property_ids = {iri.encode('utf-8'): index for index, iri in enumerate(property_iris)}
+    rdf_type = str(RDF.type).encode('utf-8')
+
+    node_ids: Dict[bytes, int] = {}
+    node_types: Dict[int, Set[int]] = collections.defaultdict(set)
+    for node_iri, type_iris in (known_types or {}).items():
+        node_id = node_ids.setdefault(f'<{node_iri}>'.encode('utf-8'), len(node_ids))
+        node_types[node_id].update(class_ids[x] for x in map(str.encode, type_iris) if x in class_ids)
+
+    subject_ids, predicate_ids, object_ids = array('q'), array('q'), array('q')
+    for stream_index, stream in enumerate(n_triples_streams):
+        # blank node labels are local to a document
+        blank_node_prefix = f'{stream_index}'.encode('utf-8')
+        for line in stream:
+            match = n_triples_resource_statement_pattern.match(line)
+            if match is None:
+                continue
+            subject, predicate, object_ = match.groups()
+            if predicate == rdf_type:
+                class_id = class_ids.get(object_[1:-1])
+                if class_id is None:
+                    continue
+                if subject[0] == ord('_'):
+                    subject = blank_node_prefix + subject
+                node_types[node_ids.setdefault(subject, len(node_ids))].add(class_id)
+            elif predicate in property_ids:
+                if subject[0] == ord('_'):
+                    subject = blank_node_prefix + subject
+                if object_[0] == ord('_'):
+                    object_ = blank_node_prefix + object_
+                subject_ids.append(node_ids.setdefault(subject, len(node_ids)))
+                predicate_ids.append(property_ids[predicate])
+                object_ids.append(node_ids.setdefault(object_, len(node_ids)))
+
+    type_counts = collections.Counter(class_id for class_set in node_types.values() for class_id in class_set)
+    relation_counts = collections.Counter()
+    for subject_id, predicate_id, object_id in zip(subject_ids, predicate_ids, object_ids):
+        subject_types = node_types.get(subject_id)
+        object_types = node_types.get(object_id)
+        if subject_types and object_types:
+            relation_counts.update((x, predicate_id, y) for x in subject_types for y in object_types)
+
+    return InstanceStatistics(
+        type_counts={class_iris[class_id]: count for class_id, count in type_counts.items()},
+        relation_counts={
+            (class_iris[subject_type], property_iris[predicate_id], class_iris[object_type]): count
+            for (subject_type, predicate_id, object_type), count in relation_counts.items()
+        }
+    )
 
 
 def build_cardinality(restrictions: List[Restriction]) -> Tuple[int, int]:
@@ -103,6 +565,88 @@ def get_cardinality_restrictions(
     return restrictions
 
 
+def build_cardinality_restriction_index(
+        classes: List[ThingClass]
+) -> Dict[Tuple[ThingClass, object, object], List[Restriction]]:
+    # The same restrictions as get_cardinality_restrictions, collected in one pass over the classes. The restrictions
+    #  on a property regardless of the range are stored with None as range
+    restriction_index = collections.defaultdict(list)
+    for class_ in classes:
+        for parent in class_.is_a:
+            if isinstance(parent, Restriction) and parent.type in relevant_restrictions:
+                restriction_index[class_, parent.property, None].append(parent)
+                if parent.value is not None:
+                    restriction_index[class_, parent.property, parent.value].append(parent)
+    return dict(restriction_index)
+
+
+@dataclass
+class PropertyClassIndex:
+    # The classes satisfying the domain and range of each property, so class matching becomes a lookup
+    attribute_classes: Dict[DataPropertyClass, Set[ThingClass]]
+    domain_classes: Dict[ObjectPropertyClass, Set[ThingClass]]
+    range_classes: Dict[ObjectPropertyClass, List[ThingClass]]
+
+
+def build_subclass_lookup(classes: List[ThingClass]) -> Dict[int, Set[ThingClass]]:
+    # Computed once per class instead of once per class pair - the lookup is keyed by the store ids of the superclasses.
+    #  The ancestors of owlready2 follow the named superclasses transitively and include the equivalent classes
+    subclass_lookup = collections.defaultdict(set)
+    for class_ in classes:
+        for superclass in class_.ancestors():
+            subclass_lookup[superclass.storid].add(class_)
+    return subclass_lookup
+
+
+def _get_satisfying_classes(
+        clause,
+        classes: List[ThingClass],
+        subclass_lookup: Dict[int, Set[ThingClass]]
+) -> Set[ThingClass]:
+    if isinstance(clause, ThingClass):
+        clause_ids = {clause.storid, *(equivalent.storid for equivalent in clause.equivalent_to.indirect())}
+        return set().union(*(subclass_lookup.get(clause_id, set()) for clause_id in clause_ids))
+    if isinstance(clause, Or):
+        return set().union(*(_get_satisfying_classes(x, classes, subclass_lookup) for x in clause.Classes))
+    if isinstance(clause, And):
+        return set(classes).intersection(
+            *(_get_satisfying_classes(x, classes, subclass_lookup) for x in clause.Classes))
+    if isinstance(clause, Not):
+        return set(classes) - _get_satisfying_classes(clause.Class, classes, subclass_lookup)
+    # Remaining constructs (restrictions, enumerations) are cheap to evaluate on classes
+    return {class_ for class_ in classes if clause._satisfied_by(class_)}
+
+
+def build_property_class_index(
+        classes: List[ThingClass],
+        object_properties: List[ObjectPropertyClass],
+        data_properties: List[DataPropertyClass]
+) -> PropertyClassIndex:
+    subclass_lookup = build_subclass_lookup(classes)
+    all_classes = set(classes)
+
+    # A data property is assigned to the classes satisfying any of its domains
+    attribute_classes = {
+        data_prop: set().union(*(
+            _get_satisfying_classes(clause, classes, subclass_lookup) for clause in data_prop.domain))
+        for data_prop in data_properties
+    }
+
+    # Multiple domain and range triples of an object property mean the intersection of these classes
+    domain_classes = {
+        object_prop: all_classes.intersection(*(
+            _get_satisfying_classes(clause, classes, subclass_lookup) for clause in object_prop.domain))
+        for object_prop in object_properties
+    }
+    range_classes = {}
+    for object_prop in object_properties:
+        matching_classes = all_classes.intersection(*(
+            _get_satisfying_classes(clause, classes, subclass_lookup) for clause in object_prop.range))
+        range_classes[object_prop] = [class_ for class_ in classes if class_ in matching_classes]
+
+    return PropertyClassIndex(attribute_classes, domain_classes, range_classes)
+
+
 def _single_cardinality_stringify(cardinality: Tuple[int, int]) -> str:
     if cardinality[0] == cardinality[1]:
         return str(cardinality[0])
@@ -1,6 +1,7 @@
-from typing import List
+from pathlib import Path
+from typing import List, Literal
 
-from pydantic import Field
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,3 +14,17 @@ class Settings(BaseSettings):
         "http://localhost:5173"
     ])
 
+    # Opt-in cache for derived RDF artifacts like reasoning results - keyed by the content hash of the inputs. Entries
+    #  are never evicted, so the directory has to be cleaned up by the operator (None: no caching)
+    rdf_cache_path: Path | None = None
+    # rdflib store for parsed RDF input - the persistent stores keep large graphs out of memory
+    rdf_store: Literal['memory', 'oxigraph', 'berkeleydb'] = 'memory'
+    # Bytes of a line based RDF file handled by one worker process and the number of processes (None: all cores)
+    rdf_chunk_size: int = 64 * 1024 * 1024
+    rdf_max_workers: int | None = None
+
+    @field_validator('rdf_cache_path')
+    @classmethod
+    def make_rdf_cache_path_absolute(cls, value: Path | None) -> Path | None:
+        # The cached files are used as base IRIs of the loaded ontologies, which have to be absolute file URLs
+        return None if value is None else value.absolute()
@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
+import os
 from pathlib import Path
 import shutil
-from typing import Dict, IO, List, Tuple
+from tempfile import NamedTemporaryFile
+from typing import Dict, IO, Iterator, List, Tuple
 
 
 class DataSourceStorage(ABC):
@@ -91,3 +93,25 @@ class FilesystemDataSourceStorage(DataSourceStorage):
     def get_plugin_name(self, data_source_name: str) -> str:
         plugin_file_path = self.storage_path / f'{data_source_name}.plugin'
         return plugin_file_path.read_text()
+
+
+@contextmanager
+def get_stream_file_path(stream: IO[bytes]) -> Iterator[str]:
+    """
+    Yields a file path with the content of the stream, e.g. for worker processes that open the data on their own
+
+    Streams of regular files are used directly, other streams are copied to a temp file that is removed afterward.
+    The stream is rewound to its previous position after copying.
+    """
+    stream_path = getattr(stream, 'name', None)
+    if isinstance(stream_path, str) and os.path.isfile(stream_path):
+        yield stream_path
+        return
+    position = stream.tell()
+    with NamedTemporaryFile(delete=False) as temp_stream:
+        shutil.copyfileobj(stream, temp_stream)
+    stream.seek(position)
+    try:
+        yield temp_stream.name
+    finally:
+        os.remove(temp_stream.name)
@@ -0,0 +1,85 @@
+import sys
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from rdflib import Graph, RDF, OWL, URIRef
+from rdflib.compare import isomorphic
+
+import simpler_core.rdf
+from simpler_core.rdf import make_n_triples_stream, extract_ontology_concepts
+
+ontology_path = Path(__file__).parents[2] / 'spec' / '0' / 'ero.ttl'
+
+
+@pytest.fixture(scope='module')
+def ontology() -> Graph:
+    return Graph().parse(ontology_path)
+
+
+def convert(content: bytes) -> Graph:
+    # BytesIO has no file name, so the format can only be detected from the content
+    with make_n_triples_stream(BytesIO(content)) as n_triples_stream:
+        return Graph().parse(n_triples_stream, format='nt')
+
+
+@pytest.mark.parametrize('rdf_format', ['turtle', 'xml', 'json-ld'])
+def test_format_detection(ontology, rdf_format):
+    content = ontology.serialize(format=rdf_format, encoding='utf-8')
+    assert simpler_core.rdf._guess_rdf_format(BytesIO(content)) == rdf_format
+    assert isomorphic(convert(content), ontology)
+
+
+def test_chunked_n_quads_conversion(ontology, monkeypatch):
+    monkeypatch.setenv('FAIRLEAD_RDF_CHUNK_SIZE', '1024')
+    monkeypatch.setenv('FAIRLEAD_RDF_MAX_WORKERS', '2')
+    # The statements are spread over named graphs, the blank nodes are shared between the chunks
+    lines = ontology.serialize(format='nt', encoding='utf-8').splitlines()
+    content = b''.join(
+        line[:-1] + f'<http://example.org/graph/{index % 3}> .\n'.encode('utf-8') if index % 2 else line + b'\n'
+        for index, line in enumerate(lines)
+    )
+    assert simpler_core.rdf._guess_rdf_format(BytesIO(content)) == 'nquads'
+    assert isomorphic(convert(content), ontology)
+
+
+def test_extract_ontology_concepts_from_stream_without_file(ontology, monkeypatch):
+    # Pellet needs a JVM, the asserted classes are enough to check the loading
+    monkeypatch.setattr(simpler_core.rdf, 'sync_reasoner_pellet', lambda world: None)
+    content = ontology.serialize(format='nt', encoding='utf-8')
+    stream = BytesIO(content)
+    classes, _, _, world, ontologies = extract_ontology_concepts([(stream, 'http://example.org/ero')])
+
+    expected_classes = {str(x) for x in ontology.subjects(RDF.type, OWL.Class) if isinstance(x, URIRef)}
+    assert {x.iri for x in classes} == expected_classes
+    assert len(ontologies) == 1
+    assert stream.read() == content
+    world.close()
+
+
+def test_line_chunks_follow_settings(ontology, monkeypatch):
+    monkeypatch.setenv('FAIRLEAD_RDF_CHUNK_SIZE', '1024')
+    monkeypatch.setenv('FAIRLEAD_RDF_MAX_WORKERS', '2')
+    content = ontology.serialize(format='nt', encoding='utf-8')
+    chunks = list(simpler_core.rdf._map_line_chunks(simpler_core.rdf._read_chunk, BytesIO(content)))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == content
+
+    # Closing the results early cancels the chunks that were not started yet
+    results = simpler_core.rdf._map_line_chunks(simpler_core.rdf._read_chunk, BytesIO(content))
+    assert next(results) == chunks[0]
+    results.close()
+
+
+def test_conversion_with_pyoxigraph_without_json_ld(ontology, monkeypatch):
+    # pyoxigraph before 0.5 has no JSON-LD format, such input is parsed with rdflib
+    pyoxigraph = pytest.importorskip('pyoxigraph')
+    format_names = ['N_TRIPLES', 'N_QUADS', 'TURTLE', 'TRIG', 'N3', 'RDF_XML']
+    monkeypatch.setitem(sys.modules, 'pyoxigraph', SimpleNamespace(
+        RdfFormat=SimpleNamespace(**{x: getattr(pyoxigraph.RdfFormat, x) for x in format_names}),
+        parse=pyoxigraph.parse,
+        serialize=pyoxigraph.serialize
+    ))
+    for rdf_format in ['json-ld', 'turtle']:
+        assert isomorphic(convert(ontology.serialize(format=rdf_format, encoding='utf-8')), ontology)
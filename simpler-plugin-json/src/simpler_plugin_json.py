@@ -1,25 +1,271 @@
+import itertools
 import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from keyword import iskeyword
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, IO, Iterator, Tuple, Any, TYPE_CHECKING
 
-from datamodel_code_generator import generate, InputFileType, DataModelType, PythonVersion, load_yaml
-from datamodel_code_generator.model import get_data_model_types, DataModel
-from datamodel_code_generator.model.pydantic_v2 import RootModel
+import ijson
+import yaml
+from ijson.common import ObjectBuilder
+from pydantic import BaseModel
 
 from simpler_core.cardinality import create_cardinality
 from simpler_core.plugin import DataSourceType, DataSourcePlugin, EntityLink
+from simpler_core.storage import get_stream_file_path
 from simpler_model import Entity, Attribute, Relation, EntityModifier
 
+if TYPE_CHECKING:
+    from datamodel_code_generator.model import DataModel
+
 
 class JSONDataSourceType(DataSourceType):
     name = 'JSON'
     inputs = [
         'data',
+        'data_lines',  # A JSON Lines file with one record per line
+        'json_lines.yaml',  # Optional - the chunk size and number of processes for the JSON Lines inference
         'schema'
     ]
-    input_validation_statement = r'(data.*|schema.*)'
+    input_validation_statement = r'(data.*|schema.*|json_lines\.yaml)'
+
+
+JsonEvent = Tuple[str, str, Any]
+
+
+def _build_value(first_event: JsonEvent, events: Iterator[JsonEvent]) -> Any:
+    # Materializes the value starting with first_event by consuming its remaining events
+    builder = ObjectBuilder()
+    depth = 0
+    for _, event, value in itertools.chain([first_event], events):
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+        if depth == 0:
+            return builder.value
+
+
+def _add_streamed_value(node: 'SchemaNode', first_event: JsonEvent, events: Iterator[JsonEvent]):
+    # Arrays are added item by item and objects key by key, so only single array items are ever held in memory.
+    #  The resulting schema is the same genson infers for the complete value.
+    _, event, _ = first_event
+    if event == 'start_array':
+        node.add_object([])
+        for item_event in events:
+            if item_event[1] == 'end_array':
+                break
+            node.add_object([_build_value(item_event, events)])
+        return
+    if event == 'start_map':
+        from genson import SchemaNode
+
+        property_nodes = {}
+        for _, key_event, key in events:
+            if key_event == 'end_map':
+                break
+            property_nodes[key] = SchemaNode()
+            _add_streamed_value(property_nodes[key], next(events), events)
+        object_schema = {'type': 'object'}
+        if property_nodes:
+            object_schema['properties'] = {key: value.to_schema() for key, value in property_nodes.items()}
+            object_schema['required'] = list(property_nodes.keys())
+        node.add_schema(object_schema)
+        return
+    node.add_object(_build_value(first_event, events))
+
+
+def build_schema_from_json_stream(stream: IO[bytes]) -> Dict:
+    # Infers the genson schema of a JSON document while parsing it incrementally with ijson
+    from genson import SchemaBuilder
+
+    builder = SchemaBuilder()
+    events = iter(ijson.parse(stream, use_float=True))
+    _add_streamed_value(builder, next(events), events)
+    # Consuming the remaining events rejects trailing content after the document
+    for _ in events:
+        pass
+    return builder.to_schema()
+
+
+@dataclass
+class JsonLinesSettings:
+    chunk_size: int = 64 * 1024 * 1024  # bytes of a JSON Lines file inferred by one worker process
+    max_workers: int | None = None  # number of processes inferring the chunks in parallel - defaults to all cores
+
+
+def _get_json_lines_chunks(path: str, chunk_size: int) -> List[Tuple[int, int]]:
+    # Splits the file into byte ranges that each end after a line break
+    file_size = os.path.getsize(path)
+    chunks = []
+    start = 0
+    with open(path, 'rb') as stream:
+        while start < file_size:
+            stream.seek(min(start + chunk_size, file_size))
+            stream.readline()
+            chunks.append((start, stream.tell()))
+            start = stream.tell()
+    return chunks
+
+
+def _build_json_lines_chunk_schema(path: str, start: int, end: int) -> Dict:
+    # Infers the schema of the records in a byte range - runs in the worker processes
+    from genson import SchemaNode
+
+    node = SchemaNode()
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        while stream.tell() < end:
+            line = stream.readline()
+            if line.strip():
+                node.add_object(json.loads(line))
+    return node.to_schema()
+
+
+def build_schema_from_json_lines(stream: IO[bytes], settings: JsonLinesSettings | None = None) -> Dict:
+    # The records are treated like the items of a JSON array, the partial schemas of the chunks are merged by genson
+    from genson import SchemaBuilder
+
+    settings = settings or JsonLinesSettings()
+    with get_stream_file_path(stream) as path:
+        chunks = _get_json_lines_chunks(path, settings.chunk_size)
+        if len(chunks) <= 1 or settings.max_workers == 1:
+            partial_schemas = [_build_json_lines_chunk_schema(path, start, end) for start, end in chunks]
+        else:
+            with ProcessPoolExecutor(settings.max_workers) as executor:
+                partial_schemas = list(executor.map(
+                    _build_json_lines_chunk_schema,
+                    itertools.repeat(path),
+                    [start for start, _ in chunks],
+                    [end for _, end in chunks]
+                ))
+
+    builder = SchemaBuilder()
+    builder.add_object([])
+    for partial_schema in partial_schemas:
+        if partial_schema:
+            builder.add_schema({'type': 'array', 'items': partial_schema})
+    return builder.to_schema()
+
+
+class UnsupportedSchemaError(Exception):
+    # Raised by the direct conversion for schemas whose models it cannot name like datamodel-code-generator does
+    pass
+
+
+@lru_cache()
+def _get_singular_name(name: str) -> str:
+    # Same naming as datamodel-code-generator uses for the item models of arrays
+    singular_name = _get_inflect_engine().singular_noun(name)
+    return f'{name}Item' if singular_name is False else singular_name
+
+
+@lru_cache(maxsize=1)
+def _get_inflect_engine():
+    import inflect
+
+    return inflect.engine()
+
+
+def _is_plain_field_name(name: str) -> bool:
+    # Names that datamodel-code-generator uses unchanged as field names
+    return name.isidentifier() and not iskeyword(name) and not name.startswith('_') and not hasattr(BaseModel, name)
+
+
+def _is_object_model(schema: Dict) -> bool:
+    return schema.get('type') == 'object' and bool(schema.get('properties'))
+
+
+def _contains_object(schema: Dict) -> bool:
+    schema_type = schema.get('type')
+    if schema_type == 'object' or isinstance(schema_type, list) and 'object' in schema_type:
+        return True
+    if 'items' in schema and _contains_object(schema['items']):
+        return True
+    return any(_contains_object(x) for x in schema.get('anyOf', []))
+
+
+class _SchemaEntityConverter:
+    # Converts genson schemas to entities directly, naming the models the same way datamodel-code-generator does.
+    #  Names are assigned in pre-order, the entities are collected in post-order like the parser results.
+
+    def __init__(self):
+        self.class_names = set()
+        self.entities: List[Entity] = []
+
+    def get_class_name(self, name: str, singular: bool = False) -> str:
+        class_name = ''.join(x[0].upper() + x[1:] for x in name.split('_') if x)
+        if singular:
+            class_name = _get_singular_name(class_name)
+        unique_name = class_name
+        count = 1
+        while unique_name in self.class_names:
+            unique_name = f'{class_name}{count}'
+            count += 1
+        self.class_names.add(unique_name)
+        return unique_name
+
+    def add_entity(self, class_name: str, attributes: List[Attribute], relations: List[Relation]):
+        self.entities.append(Entity(
+            entity_name=[class_name],
+            has_attribute=attributes,
+            is_subject_in_relation=relations,
+            is_object_in_relation=[],
+            has_entity_modifier=None
+        ))
+
+    def add_object_model(self, class_name: str, schema: Dict):
+        required = set(schema.get('required', []))
+        attributes = []
+        relations = []
+        for field_name, field_schema in schema['properties'].items():
+            if not _is_plain_field_name(field_name):
+                raise UnsupportedSchemaError(field_name)
+
+            if _is_object_model(field_schema):
+                target_name = self.get_class_name(field_name)
+                self.add_object_model(target_name, field_schema)
+                object_cardinality = (1 if field_name in required else 0, 1)
+            elif field_schema.get('type') == 'array' and _is_object_model(field_schema.get('items', {})):
+                target_name = self.get_class_name(field_name, singular=True)
+                self.add_object_model(target_name, field_schema['items'])
+                object_cardinality = (0, sys.maxsize)
+            elif _contains_object(field_schema) and not field_schema.get('type') == 'object':
+                # Unions and nested arrays of objects get model names that are not reproduced here
+                raise UnsupportedSchemaError(field_name)
+            else:
+                attributes.append(Attribute(attribute_name=[field_name], has_attribute_modifier=None))
+                continue
+
+            relations.append(Relation(
+                relation_name=[field_name],
+                has_relation_modifier=None,
+                has_object_entity=target_name,
+                has_subject_entity=class_name,
+                object_cardinality=create_cardinality(object_cardinality),
+                subject_cardinality=create_cardinality((1, 1)),
+                has_attribute=[]
+            ))
+        self.add_entity(class_name, attributes, relations)
+
+    def convert(self, schema: Dict) -> List[Entity]:
+        root_name = self.get_class_name('Model')
+        if _is_object_model(schema):
+            self.add_object_model(root_name, schema)
+        elif schema.get('type') == 'array' and _is_object_model(schema.get('items', {})):
+            self.add_object_model(self.get_class_name(root_name, singular=True), schema['items'])
+            self.add_entity(root_name, [], [])
+        elif _contains_object(schema) and not schema.get('type') == 'object':
+            raise UnsupportedSchemaError(root_name)
+        else:
+            self.add_entity(root_name, [], [])
+        return self.entities
 
 
 class JSONDataSourcePlugin(DataSourcePlugin):
@@ -28,16 +274,29 @@ class JSONDataSourcePlugin(DataSourcePlugin):
 
     def _generate_model_from_json_data(self, schema_name: str):
         with self.storage.get_data(schema_name) as stream_lookup:
-            data_content = stream_lookup['data'].read().decode('utf-8')
+            if 'data_lines' in stream_lookup:
+                settings = None
+                if 'json_lines.yaml' in stream_lookup:
+                    settings = JsonLinesSettings(**(yaml.safe_load(stream_lookup['json_lines.yaml']) or {}))
+                return self.generate_model_from_schema(
+                    build_schema_from_json_lines(stream_lookup['data_lines'], settings))
+
+            data_stream = stream_lookup['data']
+            try:
+                schema = build_schema_from_json_stream(data_stream)
+            except (ijson.JSONError, StopIteration):
+                # Not a JSON document - the data is parsed as YAML instead
+                from datamodel_code_generator import load_yaml
 
-            obj = load_yaml(
-                data_content
-            )
+                data_stream.seek(0)
+                return self.generate_model_from_dict(load_yaml(data_stream.read().decode('utf-8')))
 
-        return self.generate_model_from_dict(obj)
+        return self.generate_model_from_schema(schema)
 
     @staticmethod
-    def generate_model_from_parsed_schema(models: List[DataModel]) -> List[Entity]:
+    def generate_model_from_parsed_schema(models: List['DataModel']) -> List[Entity]:
+        from datamodel_code_generator.model.pydantic_v2 import RootModel
+
         target_name_lookup = {
             model.path: model.class_name
             for model in models
@@ -111,7 +370,22 @@ class JSONDataSourcePlugin(DataSourcePlugin):
 
         builder = SchemaBuilder()
         builder.add_object(obj)
-        schema_text = json.dumps(builder.to_schema())
+        return JSONDataSourcePlugin.generate_model_from_schema(builder.to_schema())
+
+    @staticmethod
+    def generate_model_from_schema(schema: Dict) -> List[Entity]:
+        # The common genson schemas are converted directly, which avoids importing and running the code generator
+        try:
+            return _SchemaEntityConverter().convert(schema)
+        except UnsupportedSchemaError:
+            return JSONDataSourcePlugin.generate_model_from_schema_with_parser(schema)
+
+    @staticmethod
+    def generate_model_from_schema_with_parser(schema: Dict) -> List[Entity]:
+        from datamodel_code_generator import DataModelType, PythonVersion
+        from datamodel_code_generator.model import get_data_model_types
+
+        schema_text = json.dumps(schema)
 
         data_model_types = get_data_model_types(DataModelType.PydanticV2BaseModel, PythonVersion.PY_312)
         from datamodel_code_generator.parser.jsonschema import JsonSchemaParser
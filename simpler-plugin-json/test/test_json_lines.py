@@ -0,0 +1,56 @@
+import json
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_json import JSONDataSourcePlugin, JsonLinesSettings, build_schema_from_json_lines
+
+
+def make_plugin(tmp_path: Path, records: List[Dict], **extra_inputs: str) -> JSONDataSourcePlugin:
+    input_paths = {'data_lines': tmp_path / 'data_lines'}
+    input_paths['data_lines'].write_text(''.join(f'{json.dumps(record)}\n' for record in records))
+    for input_name, content in extra_inputs.items():
+        input_paths[input_name] = tmp_path / input_name
+        input_paths[input_name].write_text(content)
+    storage = ManualFilesystemDataSourceStorage({'records': ('JSON', input_paths)})
+    return JSONDataSourcePlugin(storage, lambda *args, **kwargs: '')
+
+
+@pytest.fixture
+def records():
+    # The later records add fields, so the merged schema only has all fields if every chunk is inferred
+    return [
+        *[{'id': index, 'name': f'name {index}'} for index in range(20)],
+        *[{'id': index, 'owner': {'email': f'{index}@example.org'}} for index in range(20, 40)],
+        {'id': 40, 'tags': ['a', 'b']}
+    ]
+
+
+def get_attribute_lookup(plugin: JSONDataSourcePlugin) -> Dict[str, List[str]]:
+    return {
+        entity.entity_name[0]: sorted(x.attribute_name[0] for x in entity.has_attribute)
+        for entity in plugin.get_all_entities('records')
+    }
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_json_lines_merges_chunks(tmp_path, records, max_workers):
+    settings = f'chunk_size: 256\nmax_workers: {max_workers}'
+    chunked_lookup = get_attribute_lookup(make_plugin(tmp_path, records, **{'json_lines.yaml': settings}))
+    single_lookup = get_attribute_lookup(make_plugin(tmp_path, records))
+
+    assert chunked_lookup == single_lookup
+    assert chunked_lookup['ModelItem'] == ['id', 'name', 'tags']
+    assert chunked_lookup['Owner'] == ['email']
+
+
+def test_json_lines_from_stream_without_file(records):
+    stream = BytesIO(''.join(f'{json.dumps(record)}\n' for record in records).encode('utf-8'))
+    schema = build_schema_from_json_lines(stream, JsonLinesSettings(chunk_size=256, max_workers=2))
+
+    assert schema['type'] == 'array'
+    assert sorted(schema['items']['properties'].keys()) == ['id', 'name', 'owner', 'tags']
+    assert schema['items']['required'] == ['id']
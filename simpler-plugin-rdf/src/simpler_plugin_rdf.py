@@ -2,18 +2,31 @@ import codecs
 import collections
 import functools
 import io
+import itertools
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import ExitStack
+from dataclasses import dataclass
 from pathlib import Path
 from tempfile import TemporaryFile, NamedTemporaryFile
-from typing import List, Dict
+from typing import List, Dict, Tuple, Set, IO
 
+import requests
+import yaml
+from owlready2 import ThingClass
 from rdflib import Graph, RDF, OWL, RDFS
+import urllib3.exceptions
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 from simpler_core.cardinality import create_cardinality
 from simpler_core.plugin import DataSourcePlugin, DataSourceType
-from simpler_core.rdf import (extract_ontology_concepts, make_n_triples_stream, get_cardinality_restrictions,
-                              build_cardinality, merge_cardinalities, stringify_cardinality)
+from simpler_core.settings import Settings
+from simpler_core.rdf import (extract_ontology_concepts, make_n_triples_stream, build_cardinality,
+                              merge_cardinalities, stringify_cardinality, build_property_class_index,
+                              build_cardinality_restriction_index, collect_instance_statistics, hash_stream_content)
 
 try:
     from simpler_model import Entity, Relation, Attribute, AttributeModifier, RelationModifier, EntityModifier
@@ -42,90 +55,52 @@ select DISTINCT ?s where {{
     FILTER( STRSTARTS (STR(?s), "{0}") ) .
     # FILTER( regex(str(?s), "{0}") ) .
 }}
+ORDER BY ?s
 """
 
-attribute_query = """
-PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+# Transitive property paths get expensive on large endpoints, so the SPARQL data source only fetches direct subclass
+#  edges and the domains and ranges with their union members - the closures are computed by the plugin. The subclass
+#  edges are fetched level by level below rdf:Property and the domains and ranges of the properties with the base URL,
+#  so large endpoints do not return their whole class hierarchy.
+subclass_query_template = """
 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX owl: <http://www.w3.org/2002/07/owl#>
 
-select DISTINCT ?prop ?domain ?range where {{
-    ?prop_class rdfs:subClassOf* rdf:Property .
-    ?prop rdf:type ?prop_class .
-    FILTER(STRSTARTS(STR(?prop), "{0}"))
-    OPTIONAL {{
-        ?prop rdfs:domain ?base_domain . 
-        {{
-            ?domain rdfs:subClassOf* ?base_domain .
-        }}
-        UNION
-        {{
-            ?base_domain        owl:disjointUnionOf*    ?domain_union .
-            ?domain_union       rdf:rest*/rdf:first     ?domain .
-        }} 
-        UNION
-        {{
-            ?base_domain        owl:unionOf*            ?domain_union .
-            ?domain_union       rdf:rest*/rdf:first     ?domain .
-        }}
-    }} .
-    OPTIONAL {{
-        ?prop rdfs:range ?base_range .
-        {{
-            ?range rdfs:subClassOf* ?base_range .
-        }}
-        UNION
-        {{
-            ?base_range     owl:disjointUnionOf*    ?range_union .
-            ?range_union    rdf:rest*/rdf:first     ?range .
-        }}
-        UNION
-        {{
-            ?base_range     owl:unionOf*            ?range_union .
-            ?range_union    rdf:rest*/rdf:first     ?range .
-        }}
-        FILTER( !STRSTARTS(STR(?range), "{0}") ) .
-    }} .
+SELECT DISTINCT ?class ?superclass WHERE {{
+    VALUES ?superclass {{ {0} }}
+    ?class rdfs:subClassOf ?superclass .
+    FILTER(isIRI(?class))
 }}
+ORDER BY ?class ?superclass
 """
+subclass_query_batch_size = 500  # superclasses per subclass query
 
-relation_query_template = """
+# The members of the union lists are reached by a bounded number of rdf:rest steps instead of rdf:rest*
+union_member_limit = 64
+property_query_template = """
 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX owl: <http://www.w3.org/2002/07/owl#>
 
-select DISTINCT ?prop ?domain ?range where {{
-    ?prop_class     rdfs:subClassOf*        rdf:Property .
-    ?prop           rdf:type                ?prop_class .
-    ?prop           rdfs:domain             ?base_domain .
-    
-    {{
-        ?domain         rdfs:subClassOf*        ?base_domain .
-    }} UNION {{ 
-        ?base_domain    owl:disjointUnionOf*    ?domain_union .
-        ?domain_union       rdf:rest*/rdf:first     ?domain .
-    }} UNION {{
-        ?base_domain    owl:unionOf*            ?domain_union .
-        ?domain_union       rdf:rest*/rdf:first     ?domain .
-    }}
-    
-    ?prop           rdfs:range              ?base_range .
+SELECT DISTINCT ?prop ?prop_class ?kind ?base ?member WHERE {{
+    ?prop rdf:type ?prop_class .
+    FILTER(STRSTARTS(STR(?prop), "{0}"))
     {{
-        ?range          rdfs:subClassOf*        ?base_range .
+        ?prop rdfs:domain ?base_node .
+        BIND("domain" AS ?kind)
     }}
     UNION
     {{
-        ?base_range     owl:disjointUnionOf*    ?range_union .
-        ?range_union    rdf:rest*/rdf:first     ?range .
+        ?prop rdfs:range ?base_node .
+        BIND("range" AS ?kind)
     }}
-    UNION
-    {{
-        ?base_range     owl:unionOf*            ?range_union .
-        ?range_union    rdf:rest*/rdf:first     ?range .
+    OPTIONAL {{
+        ?base_node (owl:unionOf|owl:disjointUnionOf)/{1}rdf:first ?member .
+        FILTER(isIRI(?member))
     }}
-    
-    FILTER(STRSTARTS(STR(?prop), "{0}"))
-    FILTER(STRSTARTS(STR(?range), "{0}"))
+    # blank node labels are not stable between the pages of a query, so anonymous classes only count by their members
+    BIND(IF(isIRI(?base_node), ?base_node, "") AS ?base)
 }}
+ORDER BY ?prop ?prop_class ?kind ?base ?member
 """
 
 
@@ -138,28 +113,6 @@ select DISTINCT ?prop_class where {
 }
 """
 
-object_property_query_template = """
-SELECT DISTINCT ?subject_type ?relation ?object_type
-WHERE {{
-    VALUES ?subject_type {{ {0} }} .
-    VALUES ?object_type {{ {0} }} .
-    VALUES ?relation {{ {1} }} .
-
-    ?s rdf:type ?subject_type .
-    ?o rdf:type ?object_type .
-
-    ?s ?relation ?o .
-}}
-"""
-
-direct_instance_query_template = """
-SELECT DISTINCT ?type
-WHERE {{
-    VALUES ?type {{ {0} }} .
-    ?s rdf:type ?type .
-}}
-"""
-
 property_restrictions_query = """
 SELECT DISTINCT ?base ?restriction ?property
 WHERE {
@@ -172,10 +125,150 @@ WHERE {
 """
 
 
+# Responses per (endpoint, query) - plugins are created per request, so the cache is shared on module level
+sparql_response_cache_size = 256
+sparql_response_cache_ttl = 300  # seconds
+_sparql_response_cache: collections.OrderedDict[Tuple[str, str], Tuple[float, List[Dict[str, str]]]] = \
+    collections.OrderedDict()
+_sparql_response_cache_lock = threading.Lock()
+
+
+@dataclass
+class SparqlQuerySettings:
+    page_size: int = 10000  # rows per LIMIT/OFFSET page
+    max_workers: int = 4  # concurrent requests to the endpoint
+    retries: int = 3  # retries of failed connections and 429/5xx responses
+    backoff_factor: float = 0.5
+    timeout: float = 60  # seconds per request
+    query_timeout: float | None = 600  # seconds for all pages of a query
+    max_rows: int | None = 1000000  # rows per query
+
+
+class SparqlQueryLimitError(Exception):
+    pass
+
+
+def _is_timeout_error(error: requests.RequestException) -> bool:
+    # Read timeouts surface as connection errors wrapping the urllib3 error once the retries are used up
+    if isinstance(error, requests.Timeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.TimeoutError)
+
+
+class SparqlConnector:
+
+    def __init__(self, endpoint: str, base_url: str = '', settings: SparqlQuerySettings | None = None):
+        self.endpoint = endpoint
+        self.base_url = base_url
+        self.settings = settings or SparqlQuerySettings()
+        retry = Retry(
+            total=self.settings.retries,
+            backoff_factor=self.settings.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None  # queries are read only, so POST requests are retried as well
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.settings.max_workers,
+            pool_maxsize=self.settings.max_workers,
+            max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'application/sparql-results+json'
+        self.executor = ThreadPoolExecutor(max_workers=self.settings.max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+    def _fetch(self, query: str, timeout: float) -> List[Dict[str, str]]:
+        cache_key = (self.endpoint, query)
+        with _sparql_response_cache_lock:
+            cache_entry = _sparql_response_cache.get(cache_key)
+            if cache_entry is not None and time.monotonic() - cache_entry[0] < sparql_response_cache_ttl:
+                _sparql_response_cache.move_to_end(cache_key)
+                return cache_entry[1]
+
+        response = self.session.post(self.endpoint, data={'query': query}, timeout=timeout)
+        response.raise_for_status()
+        rows = [
+            {variable: value['value'] for variable, value in binding.items()}
+            for binding in response.json()['results']['bindings']
+        ]
+
+        with _sparql_response_cache_lock:
+            _sparql_response_cache[cache_key] = (time.monotonic(), rows)
+            _sparql_response_cache.move_to_end(cache_key)
+            while len(_sparql_response_cache) > sparql_response_cache_size:
+                _sparql_response_cache.popitem(last=False)
+        return rows
+
+    def run_query(self, query: str) -> List[Dict[str, str]]:
+        # The pages are requested in waves of max_workers concurrent requests until a page is not full
+        page_size = self.settings.page_size
+        deadline = None if self.settings.query_timeout is None else time.monotonic() + self.settings.query_timeout
+        rows = []
+        offset = 0
+        while True:
+            timeout = self.settings.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    raise SparqlQueryLimitError(f'The query took longer than {self.settings.query_timeout}s')
+            page_queries = [
+                f'{query}LIMIT {page_size} OFFSET {offset + index * page_size}\n'
+                for index in range(self.settings.max_workers)
+            ]
+            try:
+                # All pages of a wave are awaited, so the requested pages are cached even past the end of the result
+                pages = list(self.executor.map(functools.partial(self._fetch, timeout=timeout), page_queries))
+            except requests.RequestException as error:
+                if deadline is None or time.monotonic() < deadline or not _is_timeout_error(error):
+                    raise
+                raise SparqlQueryLimitError(f'The query took longer than {self.settings.query_timeout}s') from error
+            for page in pages:
+                rows.extend(page)
+                if self.settings.max_rows is not None and len(rows) > self.settings.max_rows:
+                    raise SparqlQueryLimitError(f'The query returned more than {self.settings.max_rows} rows')
+                if len(page) < page_size:
+                    return rows
+            offset += len(page_queries) * page_size
+
+    def run_queries(self, queries: List[str]) -> List[List[Dict[str, str]]]:
+        # The pages of all queries share the request pool, so only the queries themselves run in own threads
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            return list(executor.map(self.run_query, queries))
+
+
+def _get_local_name(iri: str) -> str:
+    # Same as the names of owlready2 - the part after the last "#" or otherwise after the last "/"
+    if '#' in iri:
+        return iri.rsplit('#', 1)[-1]
+    return iri.rsplit('/', 1)[-1]
+
+
+def _get_stream_url(stream: IO[bytes], input_name: str) -> str:
+    # The file URL is the base IRI of ontologies without an own IRI. Storages can hand out relative paths, and streams
+    #  without a file (e.g. BytesIO) get a URL from the input name instead.
+    stream_path = getattr(stream, 'name', None)
+    path = Path(stream_path if isinstance(stream_path, str) else input_name)
+    return path.absolute().as_uri().replace('///', '//')
+
+
 class SparqlDataSourceType(DataSourceType):
     name = 'SPARQL'
     inputs = [
-        'connector'
+        'connector',  # The URL of the SPARQL endpoint
+        'base_url',  # Optional IRI prefix of the extracted classes and properties - defaults to all IRIs
+        'query.yaml'  # Optional paging, concurrency and retry settings (see SparqlQuerySettings)
     ]
 
 
@@ -222,50 +315,66 @@ class OwlDataSourcePlugin(DataSourcePlugin):
 
         # return
 
-        with self.storage.get_data(name) as stream_lookup:
-            streams_to_load = {'ontology', 'ontology_extension'} & set(stream_lookup.keys())
-            with ExitStack() as stack:
-                streams = [
-                    stack.enter_context(make_n_triples_stream(stream_lookup[stream_name]))
-                    for stream_name in streams_to_load
-                ]
-                streams_with_url = [
-                    (stream, Path(stream.name).as_uri().replace('///', '//'))
-                    for stream in streams
-                ]
-                classes, object_properties, data_properties, world, ontologies = \
-                    extract_ontology_concepts(streams_with_url)
-
-            # if 'ontology' in stream_lookup:
-            #     with make_n_triples_stream(stream_lookup['ontology']) as n_triples_stream:
-            #         stream_path_url = Path(n_triples_stream.name).as_uri().replace('///', '//')
-            #         streams.append((n_triples_stream, stream_path_url))
-            #         classes, object_properties, data_properties, world, ontologies = \
-            #             extract_ontology_concepts([])
-
-            object_property_query = object_property_query_template.format(
-                ' '.join(f'<{class_.iri}>' for class_ in classes),
-                ' '.join(f'<{prop.iri}>' for prop in object_properties)
-            )
-
-            direct_instance_query = direct_instance_query_template.format(
-                ' '.join(f'<{class_.iri}>' for class_ in classes)
-            )
+        settings = Settings()
+        cache_path = settings.rdf_cache_path
+        with self.storage.get_data(name) as stream_lookup, ExitStack() as stack:
+            streams_to_load = sorted({'ontology', 'ontology_extension'} & set(stream_lookup.keys()))
+            content_hashes = None if cache_path is None else [
+                hash_stream_content(stream_lookup[stream_name]) for stream_name in streams_to_load
+            ]
+            streams = [
+                stack.enter_context(make_n_triples_stream(stream_lookup[stream_name], cache_path, settings.rdf_store))
+                for stream_name in streams_to_load
+            ]
+            streams_with_url = [
+                (stream, _get_stream_url(stream, stream_name))
+                for stream, stream_name in zip(streams, streams_to_load)
+            ]
+            classes, object_properties, data_properties, world, ontologies = extract_ontology_concepts(
+                streams_with_url, cache_path, content_hashes=content_hashes)
 
             object_property_query_data = set()
             direct_instance_query_data = set()
             if only_include_if_data_exists:
-                data_graph = Graph()
-                data_graph.parse(stream_lookup['data'])
-                with NamedTemporaryFile('w', newline='', delete_on_close=False, encoding='utf-8') as stream:
-                    stream_path_url = Path(stream.name).as_uri().replace('///', '//')
-                    stream.write(data_graph.serialize(format='ntriples'))
-                    stream.close()
-                    data_ontology = world.get_ontology(stream_path_url).load()
-
-                ontologies[0].imported_ontologies.append(data_ontology)
-                object_property_query_data = set(tuple(x) for x in world.sparql(object_property_query))
-                direct_instance_query_data = set(x[0] for x in world.sparql(direct_instance_query))
+                # The data is only streamed once for the statistics instead of being loaded into the world. The
+                #  ontologies are streamed as well, as the data can reference the individuals declared there - their
+                #  types are taken from the world, so they include the inferred ones
+                streams.append(stack.enter_context(
+                    make_n_triples_stream(stream_lookup['data'], cache_path, settings.rdf_store)))
+                for stream in streams:
+                    stream.seek(0)
+                known_types = {
+                    individual.iri: [x.iri for x in individual.is_a if isinstance(x, ThingClass)]
+                    for individual in world.individuals()
+                }
+                statistics = collect_instance_statistics(
+                    streams,
+                    [class_.iri for class_ in classes],
+                    [prop.iri for prop in object_properties],
+                    known_types
+                )
+
+                class_lookup = {class_.iri: class_ for class_ in classes}
+                property_lookup = {prop.iri: prop for prop in object_properties}
+                object_property_query_data = {
+                    (class_lookup[subject_type], property_lookup[prop], class_lookup[object_type])
+                    for subject_type, prop, object_type in statistics.relation_counts
+                }
+                direct_instance_query_data = {class_lookup[class_iri] for class_iri in statistics.type_counts}
+
+        property_class_index = build_property_class_index(classes, object_properties, data_properties)
+        restriction_index = build_cardinality_restriction_index(classes)
+
+        # A relation is kept if it occurs in the data in either direction, so the occurrences are joined by subject
+        inverse_lookup = collections.defaultdict(list)
+        for object_prop in object_properties:
+            if object_prop.inverse_property is not None:
+                inverse_lookup[object_prop.inverse_property].append(object_prop)
+        observed_targets = collections.defaultdict(set)
+        for subject_class, object_prop, object_class in object_property_query_data:
+            observed_targets[subject_class, object_prop].add(object_class)
+            for inverse_prop in inverse_lookup[object_prop]:
+                observed_targets[object_class, inverse_prop].add(subject_class)
 
         def type_factory(input_value) -> str:
 
@@ -305,7 +414,7 @@ class OwlDataSourcePlugin(DataSourcePlugin):
             ))
 
             for data_prop in data_properties:
-                if any(clause._satisfied_by(class_) for clause in data_prop.domain):
+                if class_ in property_class_index.attribute_classes[data_prop]:
                     attribute = Attribute(
                         attribute_name=[data_prop.name],
                         has_attribute_modifier=None
@@ -315,31 +424,25 @@ class OwlDataSourcePlugin(DataSourcePlugin):
 
             relations = []
             for object_prop in object_properties:
-                general_restrictions = get_cardinality_restrictions(class_, object_prop, None)
+                general_restrictions = restriction_index.get((class_, object_prop, None), [])
                 general_cardinality = build_cardinality(general_restrictions)
                 # all_cardinalities = [general_cardinality]
 
                 # TODO reconsider any instead of all here - i think there was a reason for it
                 #  - multiple domain triples mean the intersection of all domains not the union - so all seems correct
-                if all(clause._satisfied_by(class_) for clause in object_prop.domain):
-                    for target_class in [
-                        target_class
-                        for target_class in classes
-                        if all(clause._satisfied_by(target_class) for clause in object_prop.range)
-                    ]:
-                        if only_include_if_data_exists:
-                            # if target_class not in direct_instance_query_data:
-                            #     continue
-                            # old implementation tracking property occurrence is now replaced by
-                            #  filtering if target class has instances <-- and has been reversed because it
-                            #  caused thousands of more relations
-                            if ((class_, object_prop, target_class) not in object_property_query_data and
-                                    (target_class, object_prop.inverse_property, class_) not in
-                                    object_property_query_data):
-                                continue
-                            x = 42
-
-                        restrictions = get_cardinality_restrictions(class_, object_prop, target_class)
+                if class_ in property_class_index.domain_classes[object_prop]:
+                    target_classes = property_class_index.range_classes[object_prop]
+                    if only_include_if_data_exists:
+                        # old implementation tracking property occurrence is now replaced by
+                        #  filtering if target class has instances <-- and has been reversed because it
+                        #  caused thousands of more relations
+                        target_classes = [
+                            target_class
+                            for target_class in target_classes
+                            if target_class in observed_targets[class_, object_prop]
+                        ]
+                    for target_class in target_classes:
+                        restrictions = restriction_index.get((class_, object_prop, target_class), [])
                         specific_cardinality = build_cardinality(restrictions)
                         all_cardinalities = [general_cardinality, specific_cardinality]
 
@@ -348,8 +451,8 @@ class OwlDataSourcePlugin(DataSourcePlugin):
 
                         inverse_relation = None
                         if object_prop.inverse_property is not None:
-                            inverse_restrictions = get_cardinality_restrictions(
-                                target_class, object_prop.inverse_property, class_)
+                            inverse_restrictions = restriction_index.get(
+                                (target_class, object_prop.inverse_property, class_), [])
                             inverse_cardinality = build_cardinality(inverse_restrictions)
                             inverse_relation = object_prop.inverse_property.name
                         else:
@@ -383,6 +486,7 @@ class OwlDataSourcePlugin(DataSourcePlugin):
                     if relation.has_relation_modifier is not None:
                         target_entity.has_entity_modifier = [EntityModifier(entity_modifier='weak')]
 
+        world.close()
         return entities
 
     def get_strong_entities(self, name: str) -> List[Entity]:
@@ -407,21 +511,113 @@ class SparqlDataSourcePlugin(DataSourcePlugin):
 
     data_source_type = SparqlDataSourceType()
 
-    def get_connector(self, name: str):
+    def get_connector(self, name: str) -> SparqlConnector:
         with self.storage.get_data(name) as data_lookup:
             connector_stream = codecs.getreader('utf-8')(data_lookup['connector'])
-            connector_string = connector_stream.read()
-        # TODO some code to produce an interface to send queries to a SPARQL endpoint
-        return None
+            connector_string = connector_stream.read().strip()
+            base_url = ''
+            if 'base_url' in data_lookup:
+                base_url = codecs.getreader('utf-8')(data_lookup['base_url']).read().strip()
+            settings = None
+            if 'query.yaml' in data_lookup:
+                settings = SparqlQuerySettings(**(yaml.safe_load(data_lookup['query.yaml']) or {}))
+        return SparqlConnector(connector_string, base_url, settings)
 
     def get_strong_entities(self, name: str) -> List[Entity]:
         pass
 
+    @staticmethod
+    def _get_subclass_lookup(connector: SparqlConnector, roots: Set[str]) -> Dict[str, List[str]]:
+        # Fetches the direct subclasses of the known classes level by level until no new classes are found
+        subclass_lookup = collections.defaultdict(list)
+        known_classes = set(roots)
+        level = sorted(roots)
+        while level:
+            batches = [
+                level[start:start + subclass_query_batch_size]
+                for start in range(0, len(level), subclass_query_batch_size)
+            ]
+            results = connector.run_queries([
+                subclass_query_template.format(' '.join(f'<{x}>' for x in batch))
+                for batch in batches
+            ])
+            next_level = set()
+            for row in itertools.chain.from_iterable(results):
+                subclass_lookup[row['superclass']].append(row['class'])
+                if row['class'] not in known_classes:
+                    known_classes.add(row['class'])
+                    next_level.add(row['class'])
+            level = sorted(next_level)
+        return subclass_lookup
+
     def get_all_entities(self, name: str) -> List[Entity]:
-        connector = self.get_connector(name)
-        result = connector.run_query(entity_query_template.format(connector.base_url))
+        with self.get_connector(name) as connector:
+            class_rows, property_rows = connector.run_queries([
+                entity_query_template.format(connector.base_url),
+                property_query_template.format(connector.base_url, 'rdf:rest?/' * union_member_limit)
+            ])
+            roots = {str(RDF.Property)} | {row['base'] for row in property_rows if row['base']}
+            subclass_lookup = self._get_subclass_lookup(connector, roots)
+
+        entities: Dict[str, Entity] = {}
+        for row in class_rows:
+            entities[row['s']] = Entity(
+                entity_name=[_get_local_name(row['s'])],
+                has_attribute=[Attribute(
+                    attribute_name=['IRI'],
+                    has_attribute_modifier=[AttributeModifier(attribute_modifier='key')]
+                )],
+                has_entity_modifier=None,
+                is_object_in_relation=[],
+                is_subject_in_relation=[]
+            )
 
-        # TODO query for relations, attributes and keys
+        @functools.cache
+        def get_descendants(class_iri: str) -> Set[str]:
+            # iterative, so deep hierarchies do not hit the recursion limit - cycles are fine as well
+            descendants = {class_iri}
+            stack = [class_iri]
+            while stack:
+                for subclass in subclass_lookup[stack.pop()]:
+                    if subclass not in descendants:
+                        descendants.add(subclass)
+                        stack.append(subclass)
+            return descendants
+
+        # Same semantics as the rdfs:subClassOf* and union paths of the OWL data source: a domain or range covers its
+        #  subclasses and the members of its unions
+        property_classes = get_descendants(str(RDF.Property))
+        class_lookup = collections.defaultdict(lambda: collections.defaultdict(set))
+        for row in property_rows:
+            if row['prop_class'] not in property_classes:
+                continue
+            classes = class_lookup[row['prop']][row['kind']]
+            if row['base']:
+                classes.update(get_descendants(row['base']))
+            if 'member' in row:
+                classes.add(row['member'])
+
+        for prop, kind_lookup in class_lookup.items():
+            domains = sorted(x for x in kind_lookup['domain'] if x in entities)
+            targets = sorted(x for x in kind_lookup['range'] if x.startswith(connector.base_url) and x in entities)
+            for domain in domains:
+                if not any(x.startswith(connector.base_url) for x in kind_lookup['range']):
+                    entities[domain].has_attribute.append(Attribute(
+                        attribute_name=[_get_local_name(prop)],
+                        has_attribute_modifier=None
+                    ))
+                for target in targets:
+                    entities[domain].is_subject_in_relation.append(Relation(
+                        relation_name=[_get_local_name(prop)],
+                        has_object_entity=_get_local_name(target),
+                        has_subject_entity=_get_local_name(domain),
+                        object_cardinality=create_cardinality(build_cardinality([])),
+                        subject_cardinality=create_cardinality(build_cardinality([])),
+                        has_attribute=[],
+                        has_relation_modifier=None
+                    ))
+
+        return list(entities.values())
 
     def get_related_entity_links(self, name: str) -> List[EntityLink]:
         pass
@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import pytest
+from rdflib import Graph
+
+import simpler_core.rdf
+from simpler_core.storage import FilesystemDataSourceStorage
+from simpler_plugin_rdf import OwlDataSourcePlugin
+
+ontology_path = Path(__file__).parents[2] / 'spec' / '0' / 'ero.ttl'
+
+data_content = """
+@prefix : <http://iai.kit.edu/vocabularies/entity-relationship-ontology/> .
+
+:person a :Entity ;
+    :hasAttribute :name .
+:name a :Attribute .
+"""
+
+
+@pytest.fixture
+def reasoner_calls(monkeypatch):
+    # Pellet needs a JVM, the asserted statements are enough for the extraction
+    calls = []
+    monkeypatch.setattr(simpler_core.rdf, 'sync_reasoner_pellet', lambda world: calls.append(world))
+    return calls
+
+
+def make_plugin(storage_path: Path, ontology_format: str = 'nt', data: str = data_content) -> OwlDataSourcePlugin:
+    data_path = storage_path / 'ero'
+    data_path.mkdir(parents=True, exist_ok=True)
+    (storage_path / 'ero.plugin').write_text('OWL')
+    ontology = Graph().parse(ontology_path).serialize(format=ontology_format, encoding='utf-8')
+    (data_path / 'ontology').write_bytes(ontology)
+    (data_path / 'data').write_text(data)
+    return OwlDataSourcePlugin(FilesystemDataSourceStorage(storage_path), lambda *args, **kwargs: '')
+
+
+def get_entity_lookup(plugin: OwlDataSourcePlugin):
+    return {x.entity_name[0]: x for x in plugin.get_all_entities('ero')}
+
+
+def test_owl_extraction_with_relative_paths(tmp_path, monkeypatch, reasoner_calls):
+    # The storage of the API and the cache path can be relative, the N-Triples input is passed on unchanged
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('FAIRLEAD_RDF_CACHE_PATH', 'cache')
+    entity_lookup = get_entity_lookup(make_plugin(Path('storage')))
+
+    assert {'Attribute', 'Entity'} <= entity_lookup.keys()
+    assert len(reasoner_calls) == 1
+    assert any((tmp_path / 'cache').iterdir())
+
+
+def test_owl_extraction_reuses_cached_reasoning(tmp_path, monkeypatch, reasoner_calls):
+    monkeypatch.setenv('FAIRLEAD_RDF_CACHE_PATH', str(tmp_path / 'cache'))
+    plugin = make_plugin(tmp_path / 'storage')
+    expected = get_entity_lookup(plugin)
+    assert len(reasoner_calls) == 1
+    assert len(list((tmp_path / 'cache').glob('*.inferences.nt'))) == 1
+
+    # Without the stored world the ontologies are loaded again, but the reasoning results are taken from the cache
+    for world_path in (tmp_path / 'cache').glob('*.sqlite3'):
+        world_path.unlink()
+    assert get_entity_lookup(plugin) == expected
+    assert len(reasoner_calls) == 1
+
+    # Changed ontology content misses the cache
+    make_plugin(tmp_path / 'storage', ontology_format='turtle')
+    assert get_entity_lookup(plugin) == expected
+    assert len(reasoner_calls) == 2
+
+
+def test_owl_extraction_reopens_the_stored_world(tmp_path, monkeypatch, reasoner_calls):
+    monkeypatch.setenv('FAIRLEAD_RDF_CACHE_PATH', str(tmp_path / 'cache'))
+    plugin = make_plugin(tmp_path / 'storage')
+    expected = get_entity_lookup(plugin)
+    world_paths = list((tmp_path / 'cache').glob('*.sqlite3'))
+    assert len(world_paths) == 1
+    world_modified = world_paths[0].stat().st_mtime_ns
+
+    # The stored world already contains the loaded ontologies and the reasoning results, so neither the ontology
+    #  streams nor the inference cache are needed
+    for inferences_path in (tmp_path / 'cache').glob('*.inferences.nt'):
+        inferences_path.unlink()
+    monkeypatch.setattr(simpler_core.rdf, '_open_load_stream', None)
+    assert get_entity_lookup(plugin) == expected
+    assert len(reasoner_calls) == 1
+    assert world_paths[0].stat().st_mtime_ns == world_modified
+
+
+def test_owl_extraction_filters_by_the_streamed_instance_data(tmp_path, reasoner_calls):
+    # N-Triples data is streamed as is - the modifier is an individual declared in the ontology
+    ero = 'http://iai.kit.edu/vocabularies/entity-relationship-ontology/'
+    rdf_type = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+    data = (
+        f'<{ero}person> <{rdf_type}> <{ero}Entity> .\n'
+        f'<{ero}person> <{ero}hasEntityModifier> <{ero}weak> .\n'
+    )
+    plugin = make_plugin(tmp_path / 'storage', data=data)
+    entity_lookup = get_entity_lookup(plugin)
+    all_entity_names = plugin._get_entity_dict('ero').keys()
+
+    # Classes without instances in the data or the ontology are left out
+    assert {'Relation', 'Modifier', 'Attribute'} <= all_entity_names
+    assert {'Relation', 'Modifier'}.isdisjoint(entity_lookup.keys())
+    assert {'Entity', 'EntityModifier'} <= entity_lookup.keys()
+    # Only the relations occurring in the data are kept
+    assert [(x.relation_name[0], x.has_object_entity) for x in entity_lookup['Entity'].is_subject_in_relation] == [
+        ('hasEntityModifier', 'EntityModifier')
+    ]
+
+
+@pytest.mark.parametrize('store, module_name', [('oxigraph', 'oxrdflib'), ('berkeleydb', 'berkeleydb')])
+def test_owl_extraction_with_persistent_stores(tmp_path, monkeypatch, reasoner_calls, store, module_name):
+    pytest.importorskip(module_name)
+    # Turtle input is parsed into the store before it is converted to N-Triples
+    expected = get_entity_lookup(make_plugin(tmp_path / 'memory', ontology_format='turtle'))
+
+    monkeypatch.setenv('FAIRLEAD_RDF_CACHE_PATH', str(tmp_path / 'cache'))
+    monkeypatch.setenv('FAIRLEAD_RDF_STORE', store)
+    assert get_entity_lookup(make_plugin(tmp_path / store, ontology_format='turtle')) == expected
+    assert any((tmp_path / 'cache').glob(f'*.{store}'))
@@ -0,0 +1,100 @@
+import sys
+from io import BytesIO
+from typing import List
+
+import pytest
+from owlready2 import World
+from rdflib import Graph
+
+from simpler_core.rdf import (build_iterative_class_list, build_property_class_index, build_subclass_lookup,
+                              build_cardinality_restriction_index, get_cardinality_restrictions, build_cardinality)
+
+ontology_content = b"""
+@prefix : <http://example.org/shop/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+:Party a owl:Class .
+:Person a owl:Class ; rdfs:subClassOf :Party .
+:Organization a owl:Class ; rdfs:subClassOf :Party .
+:Customer a owl:Class ;
+    rdfs:subClassOf :Person ,
+        [ a owl:Restriction ; owl:onProperty :places ; owl:minQualifiedCardinality "1"^^xsd:nonNegativeInteger ;
+          owl:onClass :Order ] ,
+        [ a owl:Restriction ; owl:onProperty :places ; owl:maxCardinality "10"^^xsd:nonNegativeInteger ] .
+:Client a owl:Class ; owl:equivalentClass :Customer .
+:Order a owl:Class ;
+    rdfs:subClassOf [ a owl:Restriction ; owl:onProperty :placedBy ; owl:cardinality "1"^^xsd:nonNegativeInteger ] .
+:Product a owl:Class .
+
+:places a owl:ObjectProperty ; rdfs:domain :Client ; rdfs:range :Order .
+:placedBy a owl:ObjectProperty ; owl:inverseOf :places .
+:contains a owl:ObjectProperty ; rdfs:domain :Order ; rdfs:range [ a owl:Class ; owl:unionOf ( :Product :Order ) ] .
+:name a owl:DatatypeProperty ; rdfs:domain :Party .
+:price a owl:DatatypeProperty ; rdfs:domain [ a owl:Class ; owl:unionOf ( :Order :Product ) ] .
+"""
+
+
+@pytest.fixture
+def world():
+    # owlready2 does not parse Turtle
+    n_triples = Graph().parse(data=ontology_content, format='turtle').serialize(format='nt', encoding='utf-8')
+    world = World()
+    world.get_ontology('http://example.org/shop').load(fileobj=BytesIO(n_triples))
+    return world
+
+
+def get_names(classes) -> List[str]:
+    return sorted(x.name for x in classes)
+
+
+def test_subclass_lookup_follows_superclasses_and_equivalent_classes(world):
+    classes = build_iterative_class_list(world)
+    subclass_lookup = build_subclass_lookup(classes)
+
+    assert get_names(subclass_lookup[world['http://example.org/shop/Party'].storid]) == [
+        'Client', 'Customer', 'Organization', 'Party', 'Person'
+    ]
+    assert get_names(subclass_lookup[world['http://example.org/shop/Client'].storid]) == ['Client', 'Customer']
+    assert get_names(subclass_lookup[world['http://example.org/shop/Product'].storid]) == ['Product']
+
+
+def test_property_class_index(world):
+    classes = sorted(build_iterative_class_list(world), key=lambda x: x.name)
+    index = build_property_class_index(
+        classes,
+        sorted(world.object_properties(), key=lambda x: x.name),
+        sorted(world.data_properties(), key=lambda x: x.name)
+    )
+    attribute_lookup = {prop.name: get_names(matches) for prop, matches in index.attribute_classes.items()}
+    domain_lookup = {prop.name: get_names(matches) for prop, matches in index.domain_classes.items()}
+    range_lookup = {prop.name: [x.name for x in matches] for prop, matches in index.range_classes.items()}
+
+    assert attribute_lookup == {
+        'name': ['Client', 'Customer', 'Organization', 'Party', 'Person'],
+        'price': ['Order', 'Product']
+    }
+    assert domain_lookup['places'] == ['Client', 'Customer']
+    assert domain_lookup['contains'] == ['Order']
+    assert range_lookup['places'] == ['Order']
+    assert range_lookup['contains'] == ['Order', 'Product']
+    # Without a declared domain or range every class matches
+    assert domain_lookup['placedBy'] == get_names(classes)
+
+
+def test_cardinality_restriction_index_matches_the_scan(world):
+    classes = build_iterative_class_list(world)
+    restriction_index = build_cardinality_restriction_index(classes)
+    customer, order, places, placed_by = (
+        world[f'http://example.org/shop/{name}'] for name in ('Customer', 'Order', 'places', 'placedBy')
+    )
+
+    for class_ in classes:
+        for object_prop in world.object_properties():
+            for range_class in [None, *classes]:
+                assert (sorted(restriction_index.get((class_, object_prop, range_class), []), key=str)
+                        == sorted(get_cardinality_restrictions(class_, object_prop, range_class), key=str))
+    assert build_cardinality(restriction_index[customer, places, None]) == (1, 10)
+    assert build_cardinality(restriction_index[customer, places, order]) == (1, sys.maxsize)
+    assert build_cardinality(restriction_index[order, placed_by, None]) == (1, 1)
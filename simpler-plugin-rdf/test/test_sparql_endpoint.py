@@ -0,0 +1,158 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+from rdflib import Graph, OWL, RDF, RDFS, URIRef
+
+import simpler_plugin_rdf
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_rdf import SparqlDataSourcePlugin, SparqlQueryLimitError
+
+ontology_path = Path(__file__).parents[2] / 'spec' / '0' / 'ero.ttl'
+base_url = 'http://iai.kit.edu/vocabularies/entity-relationship-ontology/'
+
+
+class SparqlEndpoint(ThreadingHTTPServer):
+    # A local stand-in for a SPARQL endpoint that answers POST queries from an rdflib graph
+
+    def __init__(self, graph: Graph):
+        super().__init__(('127.0.0.1', 0), SparqlRequestHandler)
+        self.graph = graph
+        self.graph_lock = threading.Lock()
+        self.queries = []
+        self.failures_left = 0
+        self.delay = 0
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/sparql'
+
+
+class SparqlRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        query = parse_qs(body)['query'][0]
+        time.sleep(self.server.delay)
+        with self.server.graph_lock:
+            self.server.queries.append(query)
+            fail = self.server.failures_left > 0
+            if fail:
+                self.server.failures_left -= 1
+            else:
+                content = self.server.graph.query(query).serialize(format='json')
+        if fail:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    graph = Graph()
+    graph.parse(ontology_path)
+    # The queries expect the endpoint to know the property classes of the OWL vocabulary
+    graph.add((OWL.ObjectProperty, RDFS.subClassOf, RDF.Property))
+    graph.add((OWL.DatatypeProperty, RDFS.subClassOf, RDF.Property))
+    server = SparqlEndpoint(graph)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    simpler_plugin_rdf._sparql_response_cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_plugin(tmp_path: Path, endpoint_url: str, **extra_inputs: str) -> SparqlDataSourcePlugin:
+    inputs = {'connector': endpoint_url, 'base_url': base_url, **extra_inputs}
+    input_paths = {}
+    for input_name, content in inputs.items():
+        input_paths[input_name] = tmp_path / input_name
+        input_paths[input_name].write_text(content)
+    storage = ManualFilesystemDataSourceStorage({'ero': ('SPARQL', input_paths)})
+    return SparqlDataSourcePlugin(storage, lambda *args, **kwargs: '')
+
+
+def test_sparql_extraction(tmp_path, endpoint):
+    entity_lookup = {x.entity_name[0]: x for x in make_plugin(tmp_path, endpoint.url).get_all_entities('ero')}
+
+    assert sorted(entity_lookup.keys()) == [
+        'Attribute', 'AttributeModifier', 'Cardinality', 'Entity', 'EntityModifier', 'Modifier', 'Relation',
+        'RelationModifier'
+    ]
+    assert [x.attribute_name[0] for x in entity_lookup['Entity'].has_attribute] == ['IRI', 'entityName', 'entityUrl']
+    relation_names = {(x.relation_name[0], x.has_object_entity) for x in entity_lookup['Entity'].is_subject_in_relation}
+    assert ('hasAttribute', 'Attribute') in relation_names
+    assert ('isSubjectInRelation', 'Relation') in relation_names
+
+
+def test_sparql_extraction_ignores_unrelated_class_hierarchies(tmp_path, endpoint):
+    expected = make_plugin(tmp_path, endpoint.url).get_all_entities('ero')
+    simpler_plugin_rdf._sparql_response_cache.clear()
+    unrelated_class = URIRef('http://example.org/unrelated/Class')
+    endpoint.graph.add((unrelated_class, RDFS.subClassOf, URIRef('http://example.org/unrelated/Base')))
+    endpoint.queries.clear()
+
+    assert make_plugin(tmp_path, endpoint.url).get_all_entities('ero') == expected
+    subclass_rows = [
+        row for query in endpoint.queries if '?class ?superclass' in query for row in endpoint.graph.query(query)
+    ]
+    assert len(subclass_rows) > 0
+    assert all(row[0] != unrelated_class for row in subclass_rows)
+
+
+def test_sparql_extraction_paging(tmp_path, endpoint):
+    expected = make_plugin(tmp_path, endpoint.url).get_all_entities('ero')
+    simpler_plugin_rdf._sparql_response_cache.clear()
+    endpoint.queries.clear()
+
+    plugin = make_plugin(tmp_path, endpoint.url, **{'query.yaml': 'page_size: 2\nmax_workers: 3'})
+    assert plugin.get_all_entities('ero') == expected
+    assert all('LIMIT 2 OFFSET' in query for query in endpoint.queries)
+    assert len(endpoint.queries) > 3
+
+
+def test_sparql_extraction_retries_and_cache(tmp_path, endpoint):
+    endpoint.failures_left = 2
+    plugin = make_plugin(tmp_path, endpoint.url, **{'query.yaml': 'backoff_factor: 0'})
+    expected = plugin.get_all_entities('ero')
+    assert endpoint.failures_left == 0
+
+    query_count = len(endpoint.queries)
+    assert plugin.get_all_entities('ero') == expected
+    assert len(endpoint.queries) == query_count
+
+
+def test_sparql_extraction_row_limit(tmp_path, endpoint):
+    plugin = make_plugin(tmp_path, endpoint.url, **{'query.yaml': 'page_size: 2\nmax_rows: 5'})
+    with pytest.raises(SparqlQueryLimitError):
+        plugin.get_all_entities('ero')
+
+
+def test_sparql_extraction_query_timeout(tmp_path, endpoint):
+    endpoint.delay = 0.2
+    plugin = make_plugin(tmp_path, endpoint.url, **{'query.yaml': 'page_size: 2\nretries: 0\nquery_timeout: 0.5'})
+    with pytest.raises(SparqlQueryLimitError):
+        plugin.get_all_entities('ero')
+
+
+def test_sparql_extraction_http_error_after_deadline(tmp_path, endpoint):
+    # The retries with backoff outlast the deadline, but the error is no timeout
+    endpoint.failures_left = 100
+    settings = 'retries: 2\nbackoff_factor: 0.3\nquery_timeout: 0.2'
+    plugin = make_plugin(tmp_path, endpoint.url, **{'query.yaml': settings})
+    with pytest.raises(requests.RequestException):
+        plugin.get_all_entities('ero')
@@ -1,13 +1,18 @@
 import codecs
 import collections
+import concurrent.futures
 import functools
 import itertools
 import sys
+import threading
+import time
 from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple, Iterator
 
-from sqlalchemy import create_engine, Connection, text
+import yaml
+from sqlalchemy import create_engine, inspect, Connection, Engine, text, bindparam
+from sqlalchemy.exc import DBAPIError
 
 from simpler_core.cardinality import create_cardinality, merge_cardinalities
 from simpler_core.plugin import DataSourcePlugin, DataSourceType
@@ -18,15 +23,18 @@ try:
 except ImportError:
     from simpler_model import Attribute, Entity, EntityLink
 
+# The {0} placeholder of the following templates is either empty or restricts the query to a set of changed tables
+
 # the following should work not just for postgres
-table_name_query = text("""
+table_name_query_template = """
 SELECT table_schema || '.' || table_name
 FROM information_schema.tables
 WHERE table_type = 'BASE TABLE'
-AND table_schema NOT IN ('pg_catalog', 'information_schema');
-""")
+AND table_schema = :schema_name
+{0};
+"""
 
-columns_query = text("""
+columns_query_template = """
 SELECT
     table_schema || '.' || table_name as table_name,
     column_name,
@@ -35,8 +43,9 @@ SELECT
 FROM
     information_schema.columns
 WHERE
-    table_schema NOT IN ('pg_catalog', 'information_schema')
-""")
+    table_schema = :schema_name
+    {0}
+"""
 
 
 @dataclass
@@ -60,7 +69,7 @@ left join information_schema.key_column_usage kcu
           on kcu.constraint_name = tco.constraint_name
           and kcu.constraint_schema = tco.constraint_schema
           and kcu.constraint_name = tco.constraint_name
-where tab.table_schema not in ('pg_catalog', 'information_schema')
+where tab.table_schema = :schema_name
       and tab.table_type = 'BASE TABLE'
 group by tab.table_schema,
          tab.table_name,
@@ -89,8 +98,13 @@ class ForeignKey:
     def target(self) -> str:
         return f'{self.primary_table}.{self.pk_column}'
 
+    @property
+    def constraint_key(self) -> Tuple[str, str]:
+        # constraint names are only unique within a database schema (postgres even allows duplicates per table)
+        return self.foreign_table, self.constraint_name
+
 
-foreign_key_query = text("""
+foreign_key_query_template = """
 select kcu.table_schema || '.' || kcu.table_name as foreign_table,
        kcu.constraint_name,
        kcu.column_name as fk_column,
@@ -103,7 +117,7 @@ from information_schema.table_constraints tco
 join information_schema.key_column_usage kcu
           on tco.constraint_schema = kcu.constraint_schema
           and tco.constraint_name = kcu.constraint_name
-          and tco.constraint_schema = 'public'
+          and tco.constraint_schema = :schema_name
 join information_schema.referential_constraints rco
           on tco.constraint_schema = rco.constraint_schema
           and tco.constraint_name = rco.constraint_name
@@ -116,11 +130,56 @@ join information_schema.columns col
     AND col.table_name = tco.table_name
     AND col.table_schema = tco.table_schema
 where tco.constraint_type = 'FOREIGN KEY'
+{0}
 order by kcu.table_schema,
          kcu.table_name,
          kcu.ordinal_position;
+"""
+
+
+table_name_query = text(table_name_query_template.format(''))
+changed_table_name_query = text(table_name_query_template.format('AND table_name IN :table_names')) \
+    .bindparams(bindparam('table_names', expanding=True))
+columns_query = text(columns_query_template.format(''))
+changed_columns_query = text(columns_query_template.format('AND table_name IN :table_names')) \
+    .bindparams(bindparam('table_names', expanding=True))
+foreign_key_query = text(foreign_key_query_template.format(''))
+changed_foreign_key_query = text(foreign_key_query_template.format('AND kcu.table_name IN :table_names')) \
+    .bindparams(bindparam('table_names', expanding=True))
+
+# Cheap change signal for postgres: the catalog rows of a table, its columns and its constraints get a new xmin
+#  with every DDL statement touching them and relfilenode changes on rewrites (e.g. TRUNCATE, type changes)
+table_fingerprint_query = text("""
+SELECT n.nspname || '.' || c.relname AS table_name,
+       c.relfilenode::text || ':' || c.xmin::text
+       || ':' || coalesce((SELECT string_agg(a.attname || '=' || a.xmin::text, ',' ORDER BY a.attnum)
+                           FROM pg_catalog.pg_attribute a
+                           WHERE a.attrelid = c.oid AND a.attnum > 0), '')
+       || ':' || coalesce((SELECT string_agg(con.conname || '=' || con.xmin::text, ',' ORDER BY con.oid)
+                           FROM pg_catalog.pg_constraint con
+                           WHERE con.conrelid = c.oid), '') AS fingerprint
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('r', 'p')
+AND n.nspname = :schema_name;
 """)
 
+# Counts the profiled rows and the largest number of rows sharing the same foreign key values. The prefix and hint
+#  placeholders carry the statement timeout on dialects that set it per statement
+relation_profiling_query_template = """
+{prefix}SELECT {hint}coalesce(sum(value_count), 0), coalesce(max(value_count), 0)
+FROM (
+    SELECT count(*) AS value_count
+    FROM (
+        SELECT {columns}
+        FROM {table} {sample}
+        WHERE {not_null}
+        LIMIT :row_limit
+    ) profiled_rows
+    GROUP BY {columns}
+) grouped_rows
+"""
+
 unique_query = text("""
 select kcu.table_schema || '.' || kcu.table_name as foreign_table,
        kcu.constraint_name,
@@ -132,7 +191,7 @@ from information_schema.table_constraints tco
 join information_schema.key_column_usage kcu
           on tco.constraint_schema = kcu.constraint_schema
           and tco.constraint_name = kcu.constraint_name
-          and tco.constraint_schema = 'public'
+          and tco.constraint_schema = :schema_name
 join information_schema.columns col
     ON col.column_name = kcu.column_name
     AND col.table_name = tco.table_name
@@ -144,39 +203,348 @@ order by kcu.table_schema,
 """)
 
 
+@dataclass
+class SchemaIntrospection:
+    schema_name: str
+    table_names: List[str]
+    foreign_keys: List[ForeignKey]
+    attribute_lookup: Dict[str, List[Attribute]]
+
+
+default_database_schemas = ['public']
+
+# Upper bound of concurrently introspected database schemas - this also bounds the connections taken from the pool
+max_schema_workers = 8
+
+
+@dataclass
+class CatalogSnapshot:
+    fingerprints: Dict[str, str]
+    introspection: SchemaIntrospection
+
+
+@dataclass
+class ProfilingSettings:
+    sample_percent: float | None = None  # uses TABLESAMPLE SYSTEM on postgres if set
+    row_limit: int = 100000
+    min_rows: int = 10  # non-null referencing rows needed before a relation is narrowed to one-to-one
+    timeout_ms: int = 5000
+    max_workers: int = 8
+
+
+# The last introspection result of each database schema - plugin objects only live for one request so the
+#  snapshots are kept on module level and keyed by the database URL and the schema name. The least recently used
+#  snapshots are dropped once more schemas were introspected than the cache size.
+catalog_snapshot_cache_size = 64
+_catalog_snapshots: collections.OrderedDict[Tuple[str, str], CatalogSnapshot] = collections.OrderedDict()
+_catalog_snapshot_lock = threading.Lock()
+
+
 class SqlDataSourceType(DataSourceType):
     name = 'SQL'
-    inputs = ['connector']
+    inputs = [
+        'connector',
+        'schemas.yaml',  # Optional list of the database schemas to extract - defaults to "public"
+        'profiling.yaml'  # Optional - enables the data driven cardinality profiling with the given settings
+    ]
 
 
 class SqlDataSourcePlugin(DataSourcePlugin):
 
     data_source_type = SqlDataSourceType()
 
-    @contextmanager
-    def get_sql_cursor(self, name: str) -> Connection:
+    def _get_connector_string(self, name: str) -> str:
         with self.storage.get_data(name) as data_lookup:
             connector_stream = codecs.getreader('utf-8')(data_lookup['connector'])
-            connector_string = connector_stream.read()
-        engine = create_engine(connector_string)
-        with engine.connect() as cursor:
+            return connector_stream.read()
+
+    def get_database_schemas(self, name: str, engine: Engine) -> List[str]:
+        schemas = None
+        with self.storage.get_data(name) as data_lookup:
+            if 'schemas.yaml' in data_lookup:
+                schemas = yaml.safe_load(data_lookup['schemas.yaml'])
+        if isinstance(schemas, str):
+            schemas = [schemas]
+        if schemas:
+            return list(dict.fromkeys(schemas))
+        if engine.dialect.name == 'postgresql':
+            return default_database_schemas
+        return [inspect(engine).default_schema_name]
+
+    def get_profiling_settings(self, name: str) -> ProfilingSettings | None:
+        with self.storage.get_data(name) as data_lookup:
+            if 'profiling.yaml' not in data_lookup:
+                return None
+            settings = yaml.safe_load(data_lookup['profiling.yaml'])
+        return ProfilingSettings(**(settings or {}))
+
+    @contextmanager
+    def get_sql_engine(self, name: str) -> Engine:
+        engine = create_engine(self._get_connector_string(name))
+        try:
+            yield engine
+        finally:
+            engine.dispose()
+
+    @contextmanager
+    def get_sql_cursor(self, name: str) -> Connection:
+        with self.get_sql_engine(name) as engine, engine.connect() as cursor:
             yield cursor
 
     @staticmethod
-    def _get_table_names(cursor: Connection) -> List[str]:
-        result = cursor.execute(table_name_query)
+    def _get_table_fingerprints(cursor: Connection, schema_name: str) -> Dict[str, str] | None:
+        if cursor.dialect.name != 'postgresql':
+            return None  # no change signal available - always run the full introspection
+        result = cursor.execute(table_fingerprint_query, {'schema_name': schema_name})
+        return {table_name: fingerprint for table_name, fingerprint in result}
+
+    @staticmethod
+    def _refresh_introspection(
+            cursor: Connection,
+            schema_name: str,
+            previous: CatalogSnapshot,
+            fingerprints: Dict[str, str]
+    ) -> SchemaIntrospection:
+        changed_tables = {
+            table_name
+            for table_name, fingerprint in fingerprints.items()
+            if previous.fingerprints.get(table_name) != fingerprint
+        }
+        if not changed_tables and fingerprints.keys() == previous.fingerprints.keys():
+            return previous.introspection
+
+        # Everything owned by changed or dropped tables is discarded and only the changed tables are queried again
+        outdated_tables = changed_tables | (previous.fingerprints.keys() - fingerprints.keys())
+        changed_short_names = [table_name.removeprefix(f'{schema_name}.') for table_name in sorted(changed_tables)]
+
+        attribute_lookup = {
+            table_name: attributes
+            for table_name, attributes in previous.introspection.attribute_lookup.items()
+            if table_name not in outdated_tables
+        }
+        table_names = [x for x in previous.introspection.table_names if x not in outdated_tables]
+        foreign_keys = [x for x in previous.introspection.foreign_keys if x.foreign_table not in outdated_tables]
+        if changed_short_names:
+            table_names.extend(SqlDataSourcePlugin._get_table_names(cursor, schema_name, changed_short_names))
+            foreign_keys.extend(SqlDataSourcePlugin._get_foreign_key_objects(cursor, schema_name, changed_short_names))
+            attribute_lookup.update(SqlDataSourcePlugin._get_attribute_lookup(cursor, schema_name, changed_short_names))
+
+        return SchemaIntrospection(
+            schema_name=schema_name,
+            table_names=table_names,
+            foreign_keys=foreign_keys,
+            attribute_lookup=attribute_lookup
+        )
+
+    @staticmethod
+    def _introspect_schema(engine: Engine, schema_name: str) -> SchemaIntrospection:
+        snapshot_key = (str(engine.url), schema_name)
+        # Every worker checks out its own pooled connection as connections must not be shared between threads
+        with engine.connect() as cursor:
+            fingerprints = SqlDataSourcePlugin._get_table_fingerprints(cursor, schema_name)
+            with _catalog_snapshot_lock:
+                previous = _catalog_snapshots.get(snapshot_key)
+                if previous is not None:
+                    _catalog_snapshots.move_to_end(snapshot_key)
+
+            if fingerprints is not None and previous is not None:
+                introspection = SqlDataSourcePlugin._refresh_introspection(
+                    cursor, schema_name, previous, fingerprints)
+            elif cursor.dialect.name == 'postgresql':
+                introspection = SchemaIntrospection(
+                    schema_name=schema_name,
+                    table_names=SqlDataSourcePlugin._get_table_names(cursor, schema_name),
+                    foreign_keys=SqlDataSourcePlugin._get_foreign_key_objects(cursor, schema_name),
+                    attribute_lookup=SqlDataSourcePlugin._get_attribute_lookup(cursor, schema_name)
+                )
+            else:
+                introspection = SqlDataSourcePlugin._inspect_schema(cursor, schema_name)
+
+        if fingerprints is not None:
+            with _catalog_snapshot_lock:
+                _catalog_snapshots[snapshot_key] = CatalogSnapshot(fingerprints, introspection)
+                _catalog_snapshots.move_to_end(snapshot_key)
+                while len(_catalog_snapshots) > catalog_snapshot_cache_size:
+                    _catalog_snapshots.popitem(last=False)
+        return introspection
+
+    @staticmethod
+    def _inspect_schema(cursor: Connection, schema_name: str) -> SchemaIntrospection:
+        """
+        Dialect neutral alternative to the information_schema queries based on the SQLAlchemy Inspector
+        """
+        inspector = inspect(cursor)
+        table_names = inspector.get_table_names(schema=schema_name)
+        # The multi methods allow dialects to fetch the data of all tables at once - the keys are (schema, table)
+        columns_lookup = {
+            table_name: columns
+            for (_, table_name), columns in inspector.get_multi_columns(schema=schema_name).items()
+        }
+        foreign_keys_lookup = {
+            table_name: foreign_keys
+            for (_, table_name), foreign_keys in inspector.get_multi_foreign_keys(schema=schema_name).items()
+        }
+
+        attribute_lookup = collections.defaultdict(list)
+        foreign_keys = []
+        for table_name in table_names:
+            qualified_table_name = f'{schema_name}.{table_name}'
+            columns = columns_lookup.get(table_name, [])
+            nullable_lookup = {column['name']: column['nullable'] for column in columns}
+            attribute_lookup[qualified_table_name] = [
+                Attribute(
+                    attribute_name=[column['name']],
+                    has_attribute_modifier=None  # TODO populate key state of column
+                )
+                for column in columns
+            ]
+
+            for foreign_key in foreign_keys_lookup.get(table_name, []):
+                constrained_columns = foreign_key['constrained_columns']
+                # e.g. SQLite does not necessarily name its constraints, so we mimic the postgres naming scheme
+                constraint_name = foreign_key['name'] or f'{table_name}_{"_".join(constrained_columns)}_fkey'
+                referred_schema = foreign_key['referred_schema'] or schema_name
+                for no, (fk_column, pk_column) in enumerate(
+                        zip(constrained_columns, foreign_key['referred_columns']), start=1):
+                    foreign_keys.append(ForeignKey(
+                        foreign_table=qualified_table_name,
+                        constraint_name=constraint_name,
+                        fk_column=fk_column,
+                        nullable=nullable_lookup.get(fk_column, True),
+                        no=no,
+                        primary_table=f'{referred_schema}.{foreign_key["referred_table"]}',
+                        pk_column=pk_column,
+                        column_count=len(constrained_columns)
+                    ))
+
+        return SchemaIntrospection(
+            schema_name=schema_name,
+            table_names=[f'{schema_name}.{table_name}' for table_name in table_names],
+            foreign_keys=foreign_keys,
+            attribute_lookup=attribute_lookup
+        )
+
+    @staticmethod
+    def _introspect_schemas(engine: Engine, schema_names: List[str]) -> List[SchemaIntrospection]:
+        if len(schema_names) == 1:
+            return [SqlDataSourcePlugin._introspect_schema(engine, schema_names[0])]
+        with concurrent.futures.ThreadPoolExecutor(min(len(schema_names), max_schema_workers)) as executor:
+            # map keeps the order of the configured schemas so the merged result is deterministic
+            return list(executor.map(functools.partial(SqlDataSourcePlugin._introspect_schema, engine), schema_names))
+
+    @staticmethod
+    @contextmanager
+    def _statement_timeout(cursor: Connection, timeout_ms: int) -> Iterator[Tuple[str, str] | None]:
+        # Limits the execution time of the profiling query within the current transaction and yields the prefix and
+        #  hint for the query. None is yielded for dialects without a supported statement timeout
+        dialect = cursor.dialect
+        if dialect.name == 'postgresql':
+            # SET does not support bind parameters
+            cursor.execute(text(f'SET LOCAL statement_timeout = {int(timeout_ms)}'))
+            yield '', ''
+        elif dialect.name == 'mysql' and getattr(dialect, 'is_mariadb', False):
+            yield f'SET STATEMENT max_statement_time = {int(timeout_ms) / 1000} FOR ', ''
+        elif dialect.name == 'mysql':
+            yield '', f'/*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */ '
+        elif dialect.name == 'sqlite':
+            # SQLite has no statement timeout, the query is interrupted by a progress handler instead
+            deadline = time.monotonic() + timeout_ms / 1000
+            driver_connection = cursor.connection.driver_connection
+            driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+            try:
+                yield '', ''
+            finally:
+                driver_connection.set_progress_handler(None, 0)
+        else:
+            yield None
+
+    @staticmethod
+    def _profile_relation(
+            engine: Engine,
+            foreign_keys: List[ForeignKey],
+            settings: ProfilingSettings
+    ) -> Tuple[int, int] | None:
+        with engine.connect() as cursor:
+            quote = cursor.dialect.identifier_preparer.quote
+            is_sampled = settings.sample_percent is not None and cursor.dialect.name == 'postgresql'
+
+            columns = ', '.join(quote(fk.fk_column) for fk in sorted(foreign_keys, key=lambda x: x.no))
+            table = '.'.join(quote(part) for part in foreign_keys[0].foreign_table.split('.', maxsplit=1))
+            sample = f'TABLESAMPLE SYSTEM ({float(settings.sample_percent)})' if is_sampled else ''
+            not_null = ' AND '.join(f'{quote(fk.fk_column)} IS NOT NULL' for fk in foreign_keys)
+
+            try:
+                with cursor.begin(), SqlDataSourcePlugin._statement_timeout(cursor, settings.timeout_ms) as timeout:
+                    if timeout is None:
+                        return None  # profiling queries are not run without a timeout
+                    prefix, hint = timeout
+                    query = text(relation_profiling_query_template.format(
+                        prefix=prefix, hint=hint, columns=columns, table=table, sample=sample, not_null=not_null))
+                    row_count, max_value_count = cursor.execute(query, {'row_limit': settings.row_limit}).one()
+            except DBAPIError:
+                return None  # e.g. timeouts or missing privileges - leave the cardinality as it is
+
+        # Duplicate foreign key values in any sample mean a referenced row is referenced more than once
+        if max_value_count > 1:
+            return 0, sys.maxsize
+        # Finding no duplicates only shows a one-to-one relation if all non-null rows were seen and there are enough
+        #  of them - empty tables, samples and rows beyond the limit are no evidence
+        if is_sampled or row_count >= settings.row_limit or row_count < settings.min_rows:
+            return None
+        return 0, 1
+
+    @staticmethod
+    def _profile_relations(
+            engine: Engine,
+            foreign_keys: List[ForeignKey],
+            settings: ProfilingSettings
+    ) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        grouped_foreign_keys = collections.defaultdict(list)
+        for fk in foreign_keys:
+            grouped_foreign_keys[fk.constraint_key].append(fk)
+
+        with concurrent.futures.ThreadPoolExecutor(settings.max_workers) as executor:
+            futures = {
+                constraint_key: executor.submit(SqlDataSourcePlugin._profile_relation, engine, group, settings)
+                for constraint_key, group in grouped_foreign_keys.items()
+            }
+            profiled_cardinalities = {
+                constraint_key: future.result()
+                for constraint_key, future in futures.items()
+            }
+        return {
+            constraint_key: cardinality
+            for constraint_key, cardinality in profiled_cardinalities.items()
+            if cardinality is not None
+        }
+
+    @staticmethod
+    def _execute_for_tables(cursor: Connection, query, changed_query, schema_name: str, table_names: List[str] | None):
+        if table_names is None:
+            return cursor.execute(query, {'schema_name': schema_name})
+        return cursor.execute(changed_query, {'schema_name': schema_name, 'table_names': table_names})
+
+    @staticmethod
+    def _get_table_names(cursor: Connection, schema_name: str, table_names: List[str] | None = None) -> List[str]:
+        result = SqlDataSourcePlugin._execute_for_tables(
+            cursor, table_name_query, changed_table_name_query, schema_name, table_names)
         return [x[0] for x in result]
 
     @staticmethod
-    def _get_foreign_key_objects(cursor: Connection) -> List[ForeignKey]:
-        result = cursor.execute(foreign_key_query)
+    def _get_foreign_key_objects(
+            cursor: Connection,
+            schema_name: str,
+            table_names: List[str] | None = None
+    ) -> List[ForeignKey]:
+        result = SqlDataSourcePlugin._execute_for_tables(
+            cursor, foreign_key_query, changed_foreign_key_query, schema_name, table_names)
         foreign_keys = [ForeignKey(**x._mapping) for x in result]
 
         # Perform post-processing to add the column count of the constraint to each foreign key.
         #  In the future we could also think about adding this to the query but that makes the query more complex
         grouped_foreign_keys = collections.defaultdict(list)
         for fk in foreign_keys:
-            grouped_foreign_keys[fk.constraint_name].append(fk)
+            grouped_foreign_keys[fk.constraint_key].append(fk)
         for group in grouped_foreign_keys.values():
             column_count = max(x.no for x in group)
             for fk in group:
@@ -225,26 +593,24 @@ class SqlDataSourcePlugin(DataSourcePlugin):
                     visited.add(circle_string)
                     circles.append(path[path.index(path[-1]):])
 
-        circle_fk_objs = []
-        for circle in circles:
-            fk_chain = []
-            for from_path, to_path in itertools.pairwise(circle):
-                from_table, from_column = from_path.rsplit('.', maxsplit=1)
-                to_table, to_column = to_path.rsplit('.', maxsplit=1)
-
-                applicable_foreign_key = list(filter(
-                    lambda x: x.foreign_table == from_table and x.fk_column == from_column and
-                              x.primary_table == to_table and x.pk_column == to_column,
-                    foreign_keys
-                ))[0]
-                fk_chain.append(applicable_foreign_key)
+        # The first foreign key of each linked column pair, so the circles are mapped back without scanning all keys
+        foreign_key_lookup = {}
+        for fk in foreign_keys:
+            foreign_key_lookup.setdefault((fk.source, fk.target), fk)
 
-            circle_fk_objs.append(fk_chain)
-        return circle_fk_objs
+        return [
+            [foreign_key_lookup[from_path, to_path] for from_path, to_path in itertools.pairwise(circle)]
+            for circle in circles
+        ]
 
     @staticmethod
-    def _get_attribute_lookup(cursor: Connection) -> Dict[str, List[Attribute]]:
-        result = cursor.execute(columns_query)
+    def _get_attribute_lookup(
+            cursor: Connection,
+            schema_name: str,
+            table_names: List[str] | None = None
+    ) -> Dict[str, List[Attribute]]:
+        result = SqlDataSourcePlugin._execute_for_tables(
+            cursor, columns_query, changed_columns_query, schema_name, table_names)
         attribute_lookup = collections.defaultdict(list)
         for row in result:
             column = Column(**row._mapping)
@@ -275,103 +641,136 @@ class SqlDataSourcePlugin(DataSourcePlugin):
             )
             ignorable_fks.add(highest_column_count_fk)
 
-        filtered_foreign_key_objects = []
-        for a in foreign_keys:
-            found = False
-            for b in ignorable_fks:
-                if a.constraint_name == b.constraint_name:
-                    found = True
-                    break
-            if not found and a.nullable == False:
-                filtered_foreign_key_objects.append(a)
+        ignorable_constraint_keys = {fk.constraint_key for fk in ignorable_fks}
+        filtered_foreign_key_objects = [
+            fk
+            for fk in foreign_keys
+            if fk.constraint_key not in ignorable_constraint_keys and not fk.nullable
+        ]
 
         return filtered_foreign_key_objects
 
+    @staticmethod
+    def _get_transitive_cardinalities(
+            cardinalities: Dict[Tuple[str, str], Tuple[int, int]]
+    ) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        # Adds a (source, target) pair for every column reachable over a chain of the given pairs, with the cardinality
+        #  merged along the shortest chain. Each source column is expanded once over the adjacency index, so the work
+        #  is linear in the number of resulting pairs instead of comparing all pairs with each other per chain length.
+        successor_lookup = collections.defaultdict(list)
+        for (source, target), cardinality in cardinalities.items():
+            successor_lookup[source].append((target, cardinality))
+
+        transitive_cardinalities = dict(cardinalities)
+        for source in list(successor_lookup.keys()):
+            reached = {target: cardinality for target, cardinality in successor_lookup[source]}
+            queue = collections.deque(reached.items())
+            while queue:
+                column, cardinality = queue.popleft()
+                for target, next_cardinality in successor_lookup.get(column, []):
+                    if target not in reached:
+                        reached[target] = merge_cardinalities(cardinality, next_cardinality)
+                        queue.append((target, reached[target]))
+            for target, cardinality in reached.items():
+                transitive_cardinalities.setdefault((source, target), cardinality)
+        return transitive_cardinalities
+
     def get_strong_entities(self, name: str) -> List[Entity]:
         pass
 
+    @staticmethod
+    def _make_entity_name(table_name: str, schema_names: List[str]) -> str:
+        # With a single extracted schema we keep the plain table names, otherwise names are schema qualified
+        if len(schema_names) == 1:
+            return table_name.removeprefix(f'{schema_names[0]}.')
+        return table_name
+
     def get_all_entities(self, name: str) -> List[Entity]:
-        with (self.get_sql_cursor(name) as cursor):
-
-            table_names = self._get_table_names(cursor)
-            foreign_key_objects = self._get_foreign_key_objects(cursor)
-            filtered_foreign_key_objects = \
-                self._get_foreign_keys_that_apply_to_determining_entity_weakness(foreign_key_objects)
-            attribute_lookup = self._get_attribute_lookup(cursor)
-
-            grouped_foreign_keys = collections.defaultdict(list)
-            for f_key in filtered_foreign_key_objects:
-                grouped_foreign_keys[f_key.constraint_name].append(f_key)
-
-            cardinalities = {
-                (fk.source, fk.target): (0, 1) if any(x.nullable for x in group) else (1, 1)
-                for constraint_name, group in grouped_foreign_keys.items()
-                for fk in group
-            }
-            added_transitives = {1}
-            while added_transitives:
-                added_transitives = set()
-                for (source, target), cardinality in cardinalities.items():
-                    for (inner_source, inner_target), inner_cardinality in cardinalities.items():
-                        if target == inner_source and (source, inner_target) not in cardinalities:
-                            added_transitives.add((
-                                (source, inner_target),
-                                merge_cardinalities(cardinality, inner_cardinality)
-                            ))
-                for key, value in added_transitives:
-                    cardinalities[key] = value
-            grouped_cardinalities = collections.defaultdict(list)
-            for (source, target), cardinality in cardinalities.items():
-                source_table_name, _ = source.rsplit('.', maxsplit=1)
-                target_table_name, _ = target.rsplit('.', maxsplit=1)
-                grouped_cardinalities[(source_table_name, target_table_name)].append(cardinality)
-            cardinality_implications = {
-                key: functools.reduce(merge_cardinalities, cardinality_list, cardinality_list[0])
-                for key, cardinality_list in grouped_cardinalities.items()
-            }
+        profiling_settings = self.get_profiling_settings(name)
+        profiled_cardinalities = {}
+        with self.get_sql_engine(name) as engine:
+            schema_names = self.get_database_schemas(name, engine)
+            introspections = self._introspect_schemas(engine, schema_names)
+            foreign_key_objects = [foreign_key for x in introspections for foreign_key in x.foreign_keys]
+            if profiling_settings is not None:
+                profiled_cardinalities = self._profile_relations(engine, foreign_key_objects, profiling_settings)
+
+        table_names = [table_name for x in introspections for table_name in x.table_names]
+        attribute_lookup = collections.defaultdict(list)
+        for introspection in introspections:
+            attribute_lookup.update(introspection.attribute_lookup)
+
+        filtered_foreign_key_objects = \
+            self._get_foreign_keys_that_apply_to_determining_entity_weakness(foreign_key_objects)
 
-            entities = []
-            for table_name in table_names:
-                name_set = set()
-                short_name = table_name.replace('public.', '')
-                relations = []
-
-                for foreign_key in foreign_key_objects:
-                    # if foreign_key.primary_table == table_name:
-                    if foreign_key.foreign_table == table_name:
-                        # fk_short_name = foreign_key.foreign_table.replace('public.', '')
-                        fk_short_name = foreign_key.primary_table.replace('public.', '')
-
-                        if fk_short_name not in name_set:
-                            name_set.add(fk_short_name)
-
-                            subject_cardinality = create_cardinality((0, sys.maxsize))
-                            if (foreign_key.primary_table, table_name) in cardinality_implications:
-                                subject_cardinality = create_cardinality(
-                                    cardinality_implications[(foreign_key.primary_table, table_name)])
-
-                            relations.append(
-                                Relation(
-                                    relation_name=[foreign_key.constraint_name],
-                                    has_object_entity=fk_short_name,
-                                    has_subject_entity=short_name,
-                                    object_cardinality=create_cardinality((0, 1) if
-                                                                          foreign_key.nullable else (1, 1)),
-                                    subject_cardinality=subject_cardinality,
-                                    has_attribute=[],
-                                    has_relation_modifier=[RelationModifier(relation_modifier='identifying')]
-                                        if foreign_key in filtered_foreign_key_objects else None
-                                )
-                            )
-                is_weak = any(foreign_key.foreign_table == table_name for foreign_key in filtered_foreign_key_objects)
-                # is_weak = any(foreign_key.primary_table == table_name for foreign_key in filtered_foreign_key_objects)
-                entities.append(Entity(
-                    entity_name=[short_name],
-                    has_attribute=attribute_lookup[table_name],
-                    has_entity_modifier=None if not is_weak else [EntityModifier(entity_modifier='weak')],
-                    is_object_in_relation=[],
-                    is_subject_in_relation=relations
-                ))
+        grouped_foreign_keys = collections.defaultdict(list)
+        for f_key in filtered_foreign_key_objects:
+            grouped_foreign_keys[f_key.constraint_key].append(f_key)
+
+        cardinalities = {
+            (fk.source, fk.target): (0, 1) if any(x.nullable for x in group) else (1, 1)
+            for constraint_key, group in grouped_foreign_keys.items()
+            for fk in group
+        }
+        grouped_cardinalities = collections.defaultdict(list)
+        for (source, target), cardinality in self._get_transitive_cardinalities(cardinalities).items():
+            source_table_name, _ = source.rsplit('.', maxsplit=1)
+            target_table_name, _ = target.rsplit('.', maxsplit=1)
+            grouped_cardinalities[(source_table_name, target_table_name)].append(cardinality)
+        cardinality_implications = {
+            key: functools.reduce(merge_cardinalities, cardinality_list, cardinality_list[0])
+            for key, cardinality_list in grouped_cardinalities.items()
+        }
+
+        # Group the foreign keys by their owning table and keep the identifying ones in a set so the
+        #  entity construction below only touches the keys of the current table
+        foreign_keys_by_table = collections.defaultdict(list)
+        for foreign_key in foreign_key_objects:
+            foreign_keys_by_table[foreign_key.foreign_table].append(foreign_key)
+        identifying_foreign_keys = set(filtered_foreign_key_objects)
+        weak_table_names = {foreign_key.foreign_table for foreign_key in filtered_foreign_key_objects}
+
+        entities = []
+        for table_name in table_names:
+            name_set = set()
+            short_name = self._make_entity_name(table_name, schema_names)
+            relations = []
+
+            for foreign_key in foreign_keys_by_table[table_name]:
+                fk_short_name = self._make_entity_name(foreign_key.primary_table, schema_names)
+
+                if fk_short_name not in name_set:
+                    name_set.add(fk_short_name)
+
+                    subject_cardinality_tuple = (0, sys.maxsize)
+                    if (foreign_key.primary_table, table_name) in cardinality_implications:
+                        subject_cardinality_tuple = cardinality_implications[(foreign_key.primary_table, table_name)]
+                    if foreign_key.constraint_key in profiled_cardinalities:
+                        subject_cardinality_tuple = merge_cardinalities(
+                            subject_cardinality_tuple, profiled_cardinalities[foreign_key.constraint_key])
+                    subject_cardinality = create_cardinality(subject_cardinality_tuple)
+
+                    relations.append(
+                        Relation(
+                            relation_name=[foreign_key.constraint_name],
+                            has_object_entity=fk_short_name,
+                            has_subject_entity=short_name,
+                            object_cardinality=create_cardinality((0, 1) if
+                                                                  foreign_key.nullable else (1, 1)),
+                            subject_cardinality=subject_cardinality,
+                            has_attribute=[],
+                            has_relation_modifier=[RelationModifier(relation_modifier='identifying')]
+                                if foreign_key in identifying_foreign_keys else None
+                        )
+                    )
+            is_weak = table_name in weak_table_names
+            entities.append(Entity(
+                entity_name=[short_name],
+                has_attribute=[attribute.model_copy() for attribute in attribute_lookup[table_name]],
+                has_entity_modifier=None if not is_weak else [EntityModifier(entity_modifier='weak')],
+                is_object_in_relation=[],
+                is_subject_in_relation=relations
+            ))
         return entities
 
     def get_related_entity_links(self, name: str) -> List[EntityLink]:
@@ -0,0 +1,48 @@
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_sql import SqlDataSourcePlugin
+
+from synthetic_database import create_synthetic_database
+
+
+def benchmark_extraction(directory: Path, table_count: int, chain_length: int, cycle_interval: int,
+                         repetitions: int) -> List[float]:
+    database_path = directory / f'synthetic-{table_count}.db'
+    connector_string = create_synthetic_database(database_path, table_count, chain_length, cycle_interval)
+    connector_path = directory / f'connector-{table_count}'
+    connector_path.write_text(connector_string)
+
+    storage = ManualFilesystemDataSourceStorage({'synthetic': ('SQL', {'connector': connector_path})})
+    durations = []
+    for _ in range(repetitions):
+        plugin = SqlDataSourcePlugin(storage, lambda *args, **kwargs: '')
+        start = time.perf_counter()
+        entities = plugin.get_all_entities('synthetic')
+        durations.append(time.perf_counter() - start)
+        assert len(entities) == table_count
+    return durations
+
+
+def main():
+    parser = ArgumentParser(description='Times the end-to-end SQL extraction on synthetic SQLite databases')
+    parser.add_argument('table_counts', metavar='<table-count>', type=int, nargs='*', default=[100, 500, 1000])
+    parser.add_argument('--chain-length', type=int, default=10)
+    parser.add_argument('--cycle-interval', type=int, default=5)
+    parser.add_argument('--repetitions', type=int, default=3)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        for table_count in args.table_counts:
+            durations = benchmark_extraction(
+                Path(directory), table_count, args.chain_length, args.cycle_interval, args.repetitions)
+            print(f'{table_count:>6} tables: best {min(durations):8.3f}s, '
+                  f'mean {sum(durations) / len(durations):8.3f}s over {len(durations)} runs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, ForeignKey
+
+
+def create_synthetic_database(
+        path: Path,
+        table_count: int = 1000,
+        chain_length: int = 10,
+        cycle_interval: int = 5,
+        column_count: int = 5
+) -> str:
+    """
+    Creates a SQLite database with a synthetic schema and returns its connection string
+
+    The tables are organized in chains of chain_length tables. The primary key of each table references the primary
+    key of its predecessor (making it weak) and the following tables also reference the chain head with a nullable
+    foreign key. The head of every cycle_interval-th chain references the chain tail, which closes a foreign key cycle.
+
+    Parameters
+    ----------
+    path
+        The file path of the SQLite database to create
+    table_count
+        The total number of tables
+    chain_length
+        The number of tables in each foreign key chain
+    cycle_interval
+        Every n-th chain is closed to a cycle - 0 disables cycles
+    column_count
+        The number of plain data columns per table
+
+    Returns
+    -------
+    The SQLAlchemy connection string of the new database
+    """
+    metadata = MetaData()
+    for table_index in range(table_count):
+        chain_index, position = divmod(table_index, chain_length)
+        chain_head = chain_index * chain_length
+        chain_tail = min(chain_head + chain_length, table_count) - 1
+
+        # The primary key of a chain member is also a foreign key to its predecessor (an identifying relation)
+        id_foreign_keys = []
+        if position > 0:
+            id_foreign_keys.append(ForeignKey(f'{_table_name(table_index - 1)}.id'))
+        elif cycle_interval and chain_index % cycle_interval == 0 and chain_tail > chain_head:
+            id_foreign_keys.append(ForeignKey(f'{_table_name(chain_tail)}.id'))
+
+        columns = [
+            Column('id', Integer, *id_foreign_keys, primary_key=True),
+            *[Column(f'value_{column_index}', String) for column_index in range(column_count)]
+        ]
+        if position > 1:
+            columns.append(Column('head_id', ForeignKey(f'{_table_name(chain_head)}.id'), nullable=True))
+        Table(_table_name(table_index), metadata, *columns)
+
+    connector_string = f'sqlite:///{Path(path).as_posix()}'
+    engine = create_engine(connector_string)
+    # SQLite does not validate the referenced tables on creation, so the creation order does not matter for cycles
+    with engine.begin() as connection:
+        for table in metadata.tables.values():
+            table.create(connection)
+    engine.dispose()
+    return connector_string
+
+
+def _table_name(table_index: int) -> str:
+    return f'table_{table_index:05d}'
@@ -0,0 +1,165 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import simpler_plugin_sql
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_sql import SqlDataSourcePlugin
+
+from synthetic_database import create_synthetic_database
+
+
+def make_plugin(tmp_path: Path, connector_string: str, **extra_inputs: str) -> SqlDataSourcePlugin:
+    inputs = {'connector': connector_string, **extra_inputs}
+    input_paths = {}
+    for input_name, content in inputs.items():
+        input_paths[input_name] = tmp_path / input_name
+        input_paths[input_name].write_text(content)
+    storage = ManualFilesystemDataSourceStorage({'synthetic': ('SQL', input_paths)})
+    return SqlDataSourcePlugin(storage, lambda *args, **kwargs: '')
+
+
+@pytest.fixture
+def connector_string(tmp_path):
+    return create_synthetic_database(tmp_path / 'synthetic.db', table_count=20, chain_length=5, cycle_interval=2)
+
+
+@pytest.fixture
+def entity_lookup(tmp_path, connector_string):
+    entities = make_plugin(tmp_path, connector_string).get_all_entities('synthetic')
+    return {entity.entity_name[0]: entity for entity in entities}
+
+
+def test_sqlite_extraction_finds_all_tables(entity_lookup):
+    assert sorted(entity_lookup.keys()) == [f'table_{index:05d}' for index in range(20)]
+
+
+def test_sqlite_extraction_attributes(entity_lookup):
+    attribute_names = [x.attribute_name[0] for x in entity_lookup['table_00007'].has_attribute]
+    assert attribute_names == ['id', 'value_0', 'value_1', 'value_2', 'value_3', 'value_4', 'head_id']
+
+
+def test_sqlite_extraction_identifying_chain(entity_lookup):
+    # chain 1 (tables 5 to 9) is not closed to a cycle
+    assert entity_lookup['table_00005'].has_entity_modifier is None
+    entity = entity_lookup['table_00007']
+    assert entity.has_entity_modifier[0].entity_modifier == 'weak'
+
+    relation_lookup = {x.has_object_entity: x for x in entity.is_subject_in_relation}
+    assert relation_lookup.keys() == {'table_00006', 'table_00005'}
+    assert relation_lookup['table_00006'].has_relation_modifier[0].relation_modifier == 'identifying'
+    assert relation_lookup['table_00006'].object_cardinality.cardinality == 'exactlyOne'
+    assert relation_lookup['table_00005'].has_relation_modifier is None
+    assert relation_lookup['table_00005'].object_cardinality.cardinality == 'oneOrNone'
+
+
+def test_sqlite_extraction_cycle_head_references_tail(entity_lookup):
+    relations = entity_lookup['table_00000'].is_subject_in_relation
+    assert [x.has_object_entity for x in relations] == ['table_00004']
+
+
+def test_sqlite_extraction_with_profiling(tmp_path, connector_string):
+    engine = create_engine(connector_string)
+    with engine.begin() as connection:
+        connection.execute(text('INSERT INTO table_00005 (id) VALUES (1), (2)'))
+        connection.execute(text('INSERT INTO table_00006 (id) VALUES (1), (2)'))
+        connection.execute(text('INSERT INTO table_00007 (id, head_id) VALUES (1, 1), (2, 1)'))
+    engine.dispose()
+
+    plugin = make_plugin(tmp_path, connector_string, **{'profiling.yaml': 'row_limit: 1000\nmin_rows: 2'})
+    entity_lookup = {x.entity_name[0]: x for x in plugin.get_all_entities('synthetic')}
+
+    relation_lookup = {x.has_object_entity: x for x in entity_lookup['table_00007'].is_subject_in_relation}
+    assert relation_lookup['table_00006'].subject_cardinality.cardinality == 'oneOrNone'
+    assert relation_lookup['table_00005'].subject_cardinality.cardinality == 'any'
+    # table_00008 is empty, which is no evidence for one-to-one relations
+    relation_lookup = {x.has_object_entity: x for x in entity_lookup['table_00008'].is_subject_in_relation}
+    assert relation_lookup['table_00007'].subject_cardinality.cardinality == 'any'
+    assert relation_lookup['table_00005'].subject_cardinality.cardinality == 'any'
+
+
+@pytest.mark.parametrize('profiling_settings', [
+    'row_limit: 1000',  # fewer rows than min_rows
+    'row_limit: 2\nmin_rows: 1',  # the row limit is reached, so rows might be missing
+])
+def test_sqlite_extraction_with_profiling_without_evidence(tmp_path, connector_string, profiling_settings):
+    engine = create_engine(connector_string)
+    with engine.begin() as connection:
+        connection.execute(text('INSERT INTO table_00005 (id) VALUES (1), (2)'))
+        connection.execute(text('INSERT INTO table_00006 (id) VALUES (1), (2)'))
+    engine.dispose()
+
+    plugin = make_plugin(tmp_path, connector_string, **{'profiling.yaml': profiling_settings})
+    entity_lookup = {x.entity_name[0]: x for x in plugin.get_all_entities('synthetic')}
+
+    relation_lookup = {x.has_object_entity: x for x in entity_lookup['table_00006'].is_subject_in_relation}
+    assert relation_lookup['table_00005'].subject_cardinality.cardinality == 'any'
+
+
+@pytest.fixture
+def sqlite_fingerprints(monkeypatch):
+    # The catalog fingerprints only exist for postgres - SQLite gets them from the stored table definitions and the
+    #  per-table introspection is served by the Inspector, recording the tables it is asked for
+    def get_table_fingerprints(cursor, schema_name):
+        result = cursor.execute(text(f"SELECT '{schema_name}.' || name, sql FROM sqlite_master WHERE type = 'table'"))
+        return {table_name: fingerprint for table_name, fingerprint in result}
+
+    inspected_tables = []
+
+    def inspect_tables(cursor, schema_name, table_names):
+        inspected_tables.append(table_names)
+        introspection = SqlDataSourcePlugin._inspect_schema(cursor, schema_name)
+        qualified_names = {f'{schema_name}.{x}' for x in table_names}
+        return introspection, qualified_names
+
+    def get_table_names(cursor, schema_name, table_names=None):
+        introspection, qualified_names = inspect_tables(cursor, schema_name, table_names)
+        return [x for x in introspection.table_names if x in qualified_names]
+
+    def get_foreign_key_objects(cursor, schema_name, table_names=None):
+        introspection, qualified_names = inspect_tables(cursor, schema_name, table_names)
+        return [x for x in introspection.foreign_keys if x.foreign_table in qualified_names]
+
+    def get_attribute_lookup(cursor, schema_name, table_names=None):
+        introspection, qualified_names = inspect_tables(cursor, schema_name, table_names)
+        return {x: y for x, y in introspection.attribute_lookup.items() if x in qualified_names}
+
+    monkeypatch.setattr(SqlDataSourcePlugin, '_get_table_fingerprints', staticmethod(get_table_fingerprints))
+    monkeypatch.setattr(SqlDataSourcePlugin, '_get_table_names', staticmethod(get_table_names))
+    monkeypatch.setattr(SqlDataSourcePlugin, '_get_foreign_key_objects', staticmethod(get_foreign_key_objects))
+    monkeypatch.setattr(SqlDataSourcePlugin, '_get_attribute_lookup', staticmethod(get_attribute_lookup))
+    monkeypatch.setattr(simpler_plugin_sql, '_catalog_snapshots', simpler_plugin_sql.collections.OrderedDict())
+    return inspected_tables
+
+
+def test_sqlite_extraction_refreshes_changed_tables_only(tmp_path, connector_string, sqlite_fingerprints):
+    plugin = make_plugin(tmp_path, connector_string)
+    first_entities = {x.entity_name[0]: x for x in plugin.get_all_entities('synthetic')}
+    assert sqlite_fingerprints == []
+
+    engine = create_engine(connector_string)
+    with engine.begin() as connection:
+        connection.execute(text('ALTER TABLE table_00003 ADD COLUMN comment TEXT'))
+    engine.dispose()
+    second_entities = {x.entity_name[0]: x for x in plugin.get_all_entities('synthetic')}
+
+    assert sqlite_fingerprints == [['table_00003']] * 3
+    attribute_names = [x.attribute_name[0] for x in second_entities['table_00003'].has_attribute]
+    assert attribute_names[-1] == 'comment'
+    assert sorted(second_entities.keys()) == sorted(first_entities.keys())
+    assert second_entities['table_00004'] == first_entities['table_00004']
+    assert [x.has_object_entity for x in second_entities['table_00003'].is_subject_in_relation] == \
+        [x.has_object_entity for x in first_entities['table_00003'].is_subject_in_relation]
+
+
+def test_sqlite_extraction_snapshot_cache_is_bounded(tmp_path, connector_string, sqlite_fingerprints, monkeypatch):
+    monkeypatch.setattr(simpler_plugin_sql, 'catalog_snapshot_cache_size', 1)
+    other_path = tmp_path / 'other'
+    other_path.mkdir()
+    other_connector_string = create_synthetic_database(other_path / 'other.db', table_count=2)
+
+    make_plugin(tmp_path, connector_string).get_all_entities('synthetic')
+    make_plugin(other_path, other_connector_string).get_all_entities('synthetic')
+
+    assert [url for url, _ in simpler_plugin_sql._catalog_snapshots.keys()] == [other_connector_string]
@@ -1,42 +1,303 @@
 import csv
+import dataclasses
+import datetime
+import io
+import itertools
+import math
+import posixpath
 import re
-from dataclasses import dataclass
-from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import List, Callable, Dict, Iterable, TextIO, Any, Sequence
-from zipfile import ZipFile
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, closing, ExitStack
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import List, Dict, Iterator, TextIO, IO, Any, Sequence, Tuple, Callable, Protocol
+from xml.etree import ElementTree
+from zipfile import ZipFile, ZipInfo
 
 from openpyxl import Workbook, load_workbook
+import numpy as np
 import pandas as pd
 import yaml
 from openpyxl.worksheet.table import Table
-from openpyxl.worksheet.worksheet import Worksheet
 
 from simpler_core.plugin import DataSourcePlugin, DataSourceType, EntityLink
 from simpler_core.schema import load_external_schema_from_yaml
-from simpler_model import Entity, Relation, Attribute
+from simpler_core.storage import get_stream_file_path
+from simpler_core.cardinality import create_cardinality
+from simpler_model import Entity, Relation, Attribute, AttributeModifier
 from simpler_plugin_json import JSONDataSourcePlugin
 
+try:
+    from python_calamine import CalamineWorkbook, CalamineSheet
+except ImportError:
+    # The Excel plugin falls back to openpyxl for reading the cell values
+    CalamineWorkbook = None
+
 
 class TabularDataSourceType(DataSourceType):
     name = 'Tabular'
     inputs = [
         'data_no_header',  # A zip file containing all partial CSV files
         'data_header',     # A zip file containing all partial CSV files
+        'profiling.yaml',  # Optional - enables the type, key and foreign key inference with the given settings
         # 'schema'
     ]
     input_validation_statement = r'(data_header.*|data_no_header.*)'
 
 
-def extract_csv_data(directory: Path, reader_factory: Callable[[TextIO], Iterable]) -> Dict:
+def iterate_csv_members(zip_handle: ZipFile) -> Iterator[ZipInfo]:
+    # Only CSV files on the top level of the archive are considered
+    for member in zip_handle.infolist():
+        member_path = PurePosixPath(member.filename)
+        if not member.is_dir() and member_path.suffix == '.csv' and len(member_path.parts) == 1:
+            yield member
+
+
+@contextmanager
+def open_csv_member(zip_handle: ZipFile, member: ZipInfo) -> Iterator[TextIO]:
+    # The member is decompressed while reading, so nothing has to be extracted to disk or held in memory
+    with zip_handle.open(member) as binary_stream:
+        yield io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+
+
+def read_csv_columns(stream: TextIO, has_header: bool) -> List[str]:
+    first_row = next(csv.reader(stream), [])
+    if has_header:
+        return first_row
+    return [f'Column{idx}' for idx in range(len(first_row))]
+
+
+def extract_csv_columns(zip_stream: IO, has_header: bool) -> Dict[str, List[str]]:
     result = {}
-    for file in directory.glob('*.csv'):
-        with open(file, 'r') as stream:
-            reader = reader_factory(stream)
-            result[file.stem] = list(reader)
+    with ZipFile(zip_stream) as zip_handle:
+        for member in iterate_csv_members(zip_handle):
+            with open_csv_member(zip_handle, member) as stream:
+                result[PurePosixPath(member.filename).stem] = read_csv_columns(stream, has_header)
     return result
 
 
+@dataclass
+class CsvProfilingSettings:
+    chunk_size: int = 100000  # rows per vectorized pass
+    sketch_size: int = 1024  # number of minimum hashes kept per column for the inclusion estimates
+    min_containment: float = 1.0  # share of sampled values that must be found in a key column for a foreign key
+    max_key_hashes: int = 1000000  # values per column checked exactly for uniqueness, the rest against the sketch
+    max_workers: int | None = None  # number of processes profiling the files in parallel - defaults to all cores
+
+
+# Merges the types inferred for the chunks of a column - anything not comparable ends up as string
+def _merge_column_types(type_a: str | None, type_b: str | None) -> str | None:
+    if type_a is None or type_a == type_b:
+        return type_b if type_a is None else type_a
+    if type_b is None:
+        return type_a
+    if {type_a, type_b} == {'int', 'float'}:
+        return 'float'
+    return 'string'
+
+
+def _infer_column_type(values: pd.Series) -> str | None:
+    if len(values) == 0:
+        return None
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        return 'int' if (numeric % 1 == 0).all() else 'float'
+    if values.str.lower().isin(['true', 'false']).all():
+        return 'bool'
+    if pd.to_datetime(values, errors='coerce', format='ISO8601').notna().all():
+        return 'datetime'
+    return 'string'
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    column_type: str | None = None
+    nullable: bool = False
+    unique: bool = True
+    row_count: int = 0
+    # distinct hashes per chunk for the exact uniqueness check - dropped after max_key_hashes values
+    key_hashes: List[np.ndarray] | None = field(default_factory=list)
+    key_hash_count: int = 0
+    sketch: np.ndarray | None = None  # the smallest distinct value hashes (bottom-k sketch)
+
+    @property
+    def is_candidate_key(self) -> bool:
+        return self.unique and not self.nullable and self.row_count > 0
+
+    def update(self, values: pd.Series, settings: CsvProfilingSettings):
+        self.row_count += len(values)
+        non_null_values = values.dropna()
+        if len(non_null_values) < len(values):
+            self.nullable = True
+        self.column_type = _merge_column_types(self.column_type, _infer_column_type(non_null_values))
+
+        # The values are compared by their 64-bit hashes which are independent of the process computing them
+        hashes = pd.util.hash_pandas_object(non_null_values, index=False).to_numpy()
+        distinct_hashes = np.unique(hashes)
+        if self.unique and len(distinct_hashes) < len(hashes):
+            self.unique = False
+        # Values that are already in the sketch of the previous chunks are duplicates as well
+        if self.unique and self.sketch is not None and np.isin(self.sketch, distinct_hashes, assume_unique=True).any():
+            self.unique = False
+        self.sketch = distinct_hashes[:settings.sketch_size] if self.sketch is None else \
+            np.union1d(self.sketch, distinct_hashes[:settings.sketch_size])[:settings.sketch_size]
+
+        if not self.is_candidate_key:
+            self.key_hashes = None
+        elif self.key_hashes is not None:
+            # The hashes are only merged once, so the costs of a chunk do not grow with the rows read before
+            self.key_hashes.append(distinct_hashes)
+            self.key_hash_count += len(distinct_hashes)
+            if self.key_hash_count > settings.max_key_hashes:
+                self.finish()
+
+    def finish(self):
+        # Checks the collected hashes for duplicates between the chunks - later values are only checked against the
+        #  sketch, which keeps the memory per column bounded
+        if self.unique and self.key_hashes:
+            hashes = np.concatenate(self.key_hashes)
+            if len(np.unique(hashes)) < len(hashes):
+                self.unique = False
+        self.key_hashes = None
+
+    def estimate_containment_in(self, other: 'ColumnProfile') -> float:
+        """
+        Estimates the share of distinct values of this column that also occur in the other column
+
+        Both sketches contain all hashes of their column up to their largest hash, so the hashes of this sketch
+        below that threshold are a uniform sample which has to be found in the other sketch
+        """
+        if self.sketch is None or other.sketch is None or len(self.sketch) == 0 or len(other.sketch) == 0:
+            return 0.0
+        threshold = other.sketch[-1]
+        sample = self.sketch[self.sketch <= threshold]
+        if len(sample) == 0:
+            return 0.0
+        return np.isin(sample, other.sketch, assume_unique=True).sum() / len(sample)
+
+
+def profile_csv(stream: TextIO, has_header: bool, settings: CsvProfilingSettings) -> List[ColumnProfile]:
+    profiles: List[ColumnProfile] | None = None
+    try:
+        chunks = pd.read_csv(stream, header=0 if has_header else None, dtype=str, chunksize=settings.chunk_size)
+    except pd.errors.EmptyDataError:
+        # empty files have no columns, like without profiling
+        return []
+    for chunk in chunks:
+        if profiles is None:
+            profiles = [
+                ColumnProfile(name=str(column) if has_header else f'Column{idx}')
+                for idx, column in enumerate(chunk.columns)
+            ]
+        for profile, column in zip(profiles, chunk.columns):
+            profile.update(chunk[column], settings)
+    if profiles is None:
+        return []
+    for profile in profiles:
+        profile.finish()
+    return profiles
+
+
+def _profile_zip_member(
+        zip_path: str,
+        member_name: str,
+        has_header: bool,
+        settings: CsvProfilingSettings
+) -> Tuple[str, List[ColumnProfile]]:
+    # Runs in a worker process - every worker opens the archive on its own
+    with ZipFile(zip_path) as zip_handle, open_csv_member(zip_handle, zip_handle.getinfo(member_name)) as stream:
+        return PurePosixPath(member_name).stem, profile_csv(stream, has_header, settings)
+
+
+def profile_csv_members(
+        zip_stream: IO,
+        has_header: bool,
+        settings: CsvProfilingSettings
+) -> Dict[str, List[ColumnProfile]]:
+    with ZipFile(zip_stream) as zip_handle:
+        member_names = [member.filename for member in iterate_csv_members(zip_handle)]
+        if len(member_names) <= 1 or settings.max_workers == 1:
+            result = {}
+            for member_name in member_names:
+                with open_csv_member(zip_handle, zip_handle.getinfo(member_name)) as stream:
+                    result[PurePosixPath(member_name).stem] = profile_csv(stream, has_header, settings)
+            return result
+
+    zip_stream.seek(0)
+    with get_stream_file_path(zip_stream) as zip_path, ProcessPoolExecutor(settings.max_workers) as executor:
+        # map returns the results in the order of the archive members, so the merged result is deterministic
+        profiled_members = executor.map(
+            _profile_zip_member,
+            itertools.repeat(zip_path),
+            member_names,
+            itertools.repeat(has_header),
+            itertools.repeat(settings)
+        )
+        return dict(profiled_members)
+
+
+def _get_name_tokens(name: str) -> List[str]:
+    # Splits snake case, kebab case and camel case names into lower case words
+    return [x.lower() for x in re.findall(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+', name)]
+
+
+def _references_by_name(column_name: str, key_table_name: str, key_column_name: str) -> bool:
+    # The column is named after the referenced file (e.g. customer_id or customerId for customers.csv) or shares the
+    #  name of a key column that is not just called id
+    column_tokens = _get_name_tokens(column_name)
+    key_tokens = _get_name_tokens(key_column_name)
+    if column_tokens == key_tokens and key_tokens != ['id']:
+        return True
+    table_tokens = _get_name_tokens(key_table_name)
+    if not table_tokens:
+        return False
+    for tokens in [table_tokens, table_tokens[:-1] + [table_tokens[-1].removesuffix('s')]]:
+        if any(column_tokens[idx:idx + len(tokens)] == tokens for idx in range(len(column_tokens) - len(tokens) + 1)):
+            return True
+    return False
+
+
+def find_foreign_key_candidates(
+        profile_lookup: Dict[str, List[ColumnProfile]],
+        settings: CsvProfilingSettings
+) -> List[Tuple[str, ColumnProfile, str, ColumnProfile]]:
+    # The first candidate key of each file is assumed to be its primary key and is the only possible reference
+    #  target - otherwise every id column would be reported as a reference to every other id column
+    primary_keys = {}
+    for table_name, profiles in profile_lookup.items():
+        key_profile = next((x for x in profiles if x.is_candidate_key and x.column_type in ('int', 'string')), None)
+        if key_profile is not None:
+            primary_keys[table_name] = key_profile
+
+    candidates = []
+    for table_name, profiles in profile_lookup.items():
+        for profile in profiles:
+            if profile is primary_keys.get(table_name):
+                continue
+            matches = []
+            for key_table_name, key_profile in primary_keys.items():
+                if key_profile.column_type != profile.column_type:
+                    continue
+                # Any column of small integers is contained in an integer key, so the value containment alone is
+                #  only accepted for string keys. References to the own file always need the name
+                by_name = _references_by_name(profile.name, key_table_name, key_profile.name)
+                if not by_name and (key_table_name == table_name or key_profile.column_type != 'string'):
+                    continue
+                if profile.estimate_containment_in(key_profile) >= settings.min_containment:
+                    matches.append((key_table_name, key_profile))
+            # Small value ranges (e.g. 1..n) are contained in many keys, so only the tightest matches are kept
+            if matches:
+                min_row_count = min(key_profile.row_count for _, key_profile in matches)
+                candidates.extend(
+                    (table_name, profile, key_table_name, key_profile)
+                    for key_table_name, key_profile in matches
+                    if key_profile.row_count == min_row_count
+                )
+    return candidates
+
+
 class TabularDataSourcePlugin(DataSourcePlugin):
 
     data_source_type = TabularDataSourceType()
@@ -45,20 +306,23 @@ class TabularDataSourcePlugin(DataSourcePlugin):
         pass
 
     def get_all_entities(self, name: str) -> List[Entity]:
-        no_header_data = None
-        with_header_data = None
+        column_lookup = {}
+        profile_lookup = {}
+        foreign_key_candidates = []
         schema = None
-        with self.storage.get_data(name) as stream_lookup, \
-                TemporaryDirectory() as zip_no_header_directory, \
-                TemporaryDirectory() as zip_directory:
-            if 'data_no_header' in stream_lookup:
-                with ZipFile(stream_lookup['data_no_header']) as zip_handle:
-                    zip_handle.extractall(zip_no_header_directory)
-                no_header_data = extract_csv_data(Path(zip_no_header_directory), csv.reader)
-            if 'data_header' in stream_lookup:
-                with ZipFile(stream_lookup['data_header']) as zip_handle:
-                    zip_handle.extractall(zip_directory)
-                with_header_data = extract_csv_data(Path(zip_directory), lambda stream: csv.DictReader(stream))
+        with self.storage.get_data(name) as stream_lookup:
+            settings = None
+            if 'profiling.yaml' in stream_lookup:
+                settings = CsvProfilingSettings(**(yaml.safe_load(stream_lookup['profiling.yaml']) or {}))
+
+            for input_name, has_header in [('data_header', True), ('data_no_header', False)]:
+                if input_name not in stream_lookup:
+                    continue
+                if settings is None:
+                    # Without profiling only the columns of each file are needed, so only the first row is read
+                    column_lookup.update(extract_csv_columns(stream_lookup[input_name], has_header))
+                else:
+                    profile_lookup.update(profile_csv_members(stream_lookup[input_name], has_header, settings))
             # if 'schema' in stream_lookup:
             #     schema_data = load_external_schema_from_yaml(stream_lookup['schema'])
             #     schema = {
@@ -67,19 +331,15 @@ class TabularDataSourcePlugin(DataSourcePlugin):
             #         for entity in [Entity.from_dict(entity_data)]
             #     }
 
-        if with_header_data is None:
-            with_header_data = {}
-        for key, table in no_header_data.items():
-            with_header_data[key] = [
-                {
-                    f'Column{idx}': cell
-                    for idx, cell in enumerate(row)
-                }
-                for row in table
-            ]
+        if settings is not None:
+            column_lookup = {
+                table_name: [profile.name for profile in profiles]
+                for table_name, profiles in profile_lookup.items()
+            }
+            foreign_key_candidates = find_foreign_key_candidates(profile_lookup, settings)
 
         entities = []
-        for entity_name, entity_data in with_header_data.items():
+        for entity_name, columns in column_lookup.items():
             if schema is not None and entity_name in schema:
                 entities.append(schema[entity_name])
             elif schema is None:
@@ -90,16 +350,35 @@ class TabularDataSourcePlugin(DataSourcePlugin):
                     is_subject_in_relation=[],
                     entity_name=[entity_name]
                 )
+                key_columns = {
+                    profile.name
+                    for profile in profile_lookup.get(entity_name, [])
+                    if profile.is_candidate_key
+                }
                 attributes = []
-                for heading in entity_data[0].keys():
+                for heading in columns:
                     combined_name = f'{entity_name}_{heading}'
                     attribute = Attribute(
                         attribute_name=[combined_name],
                         is_attribute_of=None,
-                        has_attribute_modifier=[]
+                        has_attribute_modifier=[AttributeModifier(attribute_modifier='key')]
+                        if heading in key_columns else []
                     )
                     attributes.append(attribute)
                 entity.has_attribute = attributes
+                entity.is_subject_in_relation = [
+                    Relation(
+                        relation_name=[f'{entity_name}_{profile.name}_{key_table_name}'],
+                        has_object_entity=key_table_name,
+                        has_subject_entity=entity_name,
+                        object_cardinality=create_cardinality((0, 1) if profile.nullable else (1, 1)),
+                        subject_cardinality=create_cardinality((0, 1) if profile.unique else (0, sys.maxsize)),
+                        has_attribute=[],
+                        has_relation_modifier=None
+                    )
+                    for table_name, profile, key_table_name, key_profile in foreign_key_candidates
+                    if table_name == entity_name
+                ]
                 entities.append(entity)
 
         return entities
@@ -144,24 +423,146 @@ def get_column_count_from_data_ref(ref: str) -> int:
     return end_number - start_number + 1
 
 
-def data_generator(sheet: Worksheet, ref: str):
+def get_range_of_ref_string(ref: str) -> Tuple[int, int, int, int]:
+    # Returns the one based start row, end row, start column and end column of the ref
     start, end = ref.split(':')
     start_column, start_row = re.match(r'([A-Z]+)(\d+)', start).groups()
     end_column, end_row = re.match(r'([A-Z]+)(\d+)', end).groups()
+    return (
+        int(start_row), int(end_row),
+        column_string_to_number(start_column) + 1, column_string_to_number(end_column) + 1
+    )
+
+
+class RowIterableSheet(Protocol):
+    # The part of the openpyxl worksheets used here, which the normal and the read only worksheets both provide
+    title: str
 
-    start_row_number = int(start_row)
-    end_row_number = int(end_row)
+    def iter_rows(
+            self,
+            min_row: int | None = None,
+            max_row: int | None = None,
+            min_col: int | None = None,
+            max_col: int | None = None,
+            values_only: bool = False
+    ) -> Iterator[Tuple[Any, ...]]:
+        ...
 
-    start_column_number = column_string_to_number(start_column) + 1
-    end_column_number = column_string_to_number(end_column) + 1
 
+def data_generator(sheet: RowIterableSheet, ref: str):
+    start_row_number, end_row_number, start_column_number, end_column_number = get_range_of_ref_string(ref)
+
+    row_count = 0
     for row in sheet.iter_rows(
         min_row=start_row_number,
         max_row=end_row_number,
         min_col=start_column_number,
         max_col=end_column_number
     ):
+        row_count += 1
         yield [cell.value for cell in row]
+    # Read only worksheets stop at the last used row, the remaining rows of the range are returned empty
+    for _ in range(end_row_number - start_row_number + 1 - row_count):
+        yield [None] * (end_column_number - start_column_number + 1)
+
+
+def _normalize_calamine_value(value: Any) -> Any:
+    # Converts the calamine cell values to the ones openpyxl returns for the same cells
+    # formula cells without a cached value are empty strings or NaN
+    if isinstance(value, str) and value == '':
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def calamine_data_generator(sheet: 'CalamineSheet', ref: str):
+    start_row_number, end_row_number, start_column_number, end_column_number = get_range_of_ref_string(ref)
+    width = end_column_number - start_column_number + 1
+
+    # Calamine yields the rows from the top of the sheet but the columns only from the first used one
+    column_offset = sheet.start[1] + 1 if sheet.start is not None else 1
+    first_index = start_column_number - column_offset
+    row_count = 0
+    for row in itertools.islice(sheet.iter_rows(), start_row_number - 1, end_row_number):
+        values = [
+            _normalize_calamine_value(row[index]) if 0 <= index < len(row) else None
+            for index in range(first_index, first_index + width)
+        ]
+        row_count += 1
+        yield values
+    for _ in range(end_row_number - start_row_number + 1 - row_count):
+        yield [None] * width
+
+
+package_relationships_namespace = 'http://schemas.openxmlformats.org/package/2006/relationships'
+office_relationships_namespace = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+spreadsheet_namespace = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+office_document_relation_type = f'{office_relationships_namespace}/officeDocument'
+table_relation_type = f'{office_relationships_namespace}/table'
+
+
+def _read_relationships(archive: ZipFile, part_name: str) -> List[Tuple[str, str]]:
+    # Returns the id, type and resolved part name of the internal relationships of a package part ('' for the package)
+    folder, file_name = posixpath.split(part_name)
+    rels_name = posixpath.join(folder, '_rels', f'{file_name}.rels')
+    if rels_name not in archive.namelist():
+        return []
+    relationships = []
+    for element in ElementTree.fromstring(archive.read(rels_name)):
+        if element.tag != f'{{{package_relationships_namespace}}}Relationship' or \
+                element.get('TargetMode') == 'External':
+            continue
+        target = element.get('Target')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(folder, target))
+        relationships.append((element.get('Id'), element.get('Type'), target))
+    return relationships
+
+
+def get_native_tables(workbook_stream: IO[bytes]) -> Dict[str, List[Table]]:
+    # Read only worksheets do not parse their table parts, so the tables of each sheet are resolved from the package
+    #  relations of the workbook, its sheets and their tables
+    tables = {}
+    with ZipFile(workbook_stream) as archive:
+        workbook_part = next(
+            target
+            for _, relation_type, target in _read_relationships(archive, '')
+            if relation_type == office_document_relation_type
+        )
+        sheet_parts = {
+            relation_id: target
+            for relation_id, _, target in _read_relationships(archive, workbook_part)
+        }
+        workbook = ElementTree.fromstring(archive.read(workbook_part))
+        for sheet in workbook.iter(f'{{{spreadsheet_namespace}}}sheet'):
+            sheet_part = sheet_parts[sheet.get(f'{{{office_relationships_namespace}}}id')]
+            tables[sheet.get('name')] = [
+                Table.from_tree(ElementTree.fromstring(archive.read(target)))
+                for _, relation_type, target in _read_relationships(archive, sheet_part)
+                if relation_type == table_relation_type
+            ]
+    workbook_stream.seek(0)
+    return tables
+
+
+@dataclass
+class ExcelSamplingSettings:
+    strategy: str = 'first'  # 'first' (leading rows), 'stratified' (evenly spaced rows) or 'all'
+    row_count: int | None = 1000  # row budget per table - None reads all rows
+
+    def select_positions(self, total_rows: int) -> Sequence[int]:
+        if self.strategy == 'all' or self.row_count is None or total_rows <= self.row_count:
+            return range(total_rows)
+        if self.strategy == 'first':
+            return range(self.row_count)
+        if self.strategy == 'stratified':
+            # Evenly spaced rows from the whole table, always including the first and the last one
+            return np.unique(np.linspace(0, total_rows - 1, self.row_count).round().astype(int)).tolist()
+        raise ValueError(f'Unknown sampling strategy {self.strategy}')
 
 
 @dataclass
@@ -169,18 +570,30 @@ class ExcelTableDefinition:
     index: pd.MultiIndex | pd.Index | List[int | str] | range
     columns: pd.MultiIndex | pd.Index | List[str]
     data_ref: str
-    worksheet: Worksheet
+    worksheet: 'RowIterableSheet | CalamineSheet'
     table_name: str
-
-    def get_frame(self) -> pd.DataFrame:
+    # Yields the cell values of a range of the worksheet - replaced together with the worksheet for other engines
+    row_generator: Callable[[Any, str], Iterator[List[Any]]] = data_generator
+
+    def get_frame(self, sampling: ExcelSamplingSettings | None = None) -> pd.DataFrame:
+        if sampling is None:
+            return pd.DataFrame(
+                data=self.row_generator(self.worksheet, self.data_ref),
+                index=self.index,
+                columns=self.columns
+            )
+        positions = sampling.select_positions(len(self.index))
+        selected = set(positions)
+        # The row range ends after the last selected position, so the rest of the sheet is never parsed
+        rows = zip(range(positions[-1] + 1 if positions else 0), self.row_generator(self.worksheet, self.data_ref))
         return pd.DataFrame(
-            data=data_generator(self.worksheet, self.data_ref),
-            index=self.index,
+            data=[row for position, row in rows if position in selected],
+            index=[self.index[position] for position in positions],
             columns=self.columns
         )
 
     @staticmethod
-    def from_native_table(table: Table, worksheet: Worksheet) -> 'ExcelTableDefinition':
+    def from_native_table(table: Table, worksheet: RowIterableSheet) -> 'ExcelTableDefinition':
         data_ref = get_table_ref_without_header(table)
         return ExcelTableDefinition(
             index=get_index_range_of_ref_string(data_ref),
@@ -192,7 +605,7 @@ class ExcelTableDefinition:
 
     @staticmethod
     def from_custom_table_def(
-            worksheet: Worksheet,
+            worksheet: RowIterableSheet,
             header_ref: str | None,
             data_ref: str,
             name: str
@@ -217,11 +630,24 @@ class ExcelTableDefinition:
         )
 
 
+def isoformat_datetime_column(column: pd.Series) -> pd.Series:
+    # Vectorized equivalent of Timestamp.isoformat - the fraction is only kept for values with microseconds.
+    #  numpy formats in C, Series.dt.strftime would call strftime for every value again.
+    formatted = np.datetime_as_string(column.to_numpy(dtype='datetime64[us]'), unit='us')
+    formatted = pd.Series(formatted, index=column.index, dtype='object').str.removesuffix('.000000')
+    return formatted.where(column.notna(), None)
+
+
+excel_engines = ['calamine', 'openpyxl']
+
+
 class ExcelDataSourceType(DataSourceType):
     name = 'Excel'
     inputs = [
         'workbook.xlsx',  # The XLSX Document
-        'table_def.yaml'
+        'table_def.yaml',
+        'sampling.yaml',  # Optional - the rows read per table for the schema inference
+        'engine',  # Optional - the engine reading the cell values, 'calamine' (default if installed) or 'openpyxl'
     ]
     input_validation_statement = r'.*workbook\.xlsx'
 
@@ -230,23 +656,58 @@ class ExcelDataSourcePlugin(DataSourcePlugin):
 
     data_source_type = ExcelDataSourceType()
 
-    def _get_tables(self, name: str) -> Dict[str, pd.DataFrame]:
+    def get_excel_engine(self, name: str) -> str:
+        with self.storage.get_data(name) as stream_lookup:
+            if 'engine' in stream_lookup:
+                engine = stream_lookup['engine'].read().decode('utf-8').strip()
+            else:
+                engine = 'calamine'
+        if engine not in excel_engines:
+            raise ValueError(f'Unknown Excel engine {engine}')
+        if engine == 'calamine' and CalamineWorkbook is None:
+            return 'openpyxl'
+        return engine
+
+    @staticmethod
+    def _use_calamine(workbook_stream: IO[bytes],
+                      table_definitions: List[ExcelTableDefinition]) -> List[ExcelTableDefinition]:
+        # The tables are still located with openpyxl, so only the reading of the data ranges differs between engines
+        workbook_stream.seek(0)
+        workbook = CalamineWorkbook.from_filelike(workbook_stream)
+        sheet_lookup = {}
+        for definition in table_definitions:
+            sheet_name = definition.worksheet.title
+            if sheet_name not in sheet_lookup:
+                sheet_lookup[sheet_name] = workbook.get_sheet_by_name(sheet_name)
+        return [
+            dataclasses.replace(
+                definition,
+                worksheet=sheet_lookup[definition.worksheet.title],
+                row_generator=calamine_data_generator
+            )
+            for definition in table_definitions
+        ]
+
+    def _get_tables(self, name: str, sampling: ExcelSamplingSettings | None = None,
+                    engine: str = 'openpyxl') -> Dict[str, pd.DataFrame]:
         tables: Dict[str, pd.DataFrame] = {}
         table_definitions: List[ExcelTableDefinition] = []
-        with self.storage.get_data(name) as stream_lookup:
-            # workbook = load_workbook(stream_lookup['workbook.xlsx'], read_only=True)
-            workbook = load_workbook(stream_lookup['workbook.xlsx'])
+        with self.storage.get_data(name) as stream_lookup, ExitStack() as stack:
+            native_tables = get_native_tables(stream_lookup['workbook.xlsx'])
+            # In read only mode the cells are streamed from the sheet XML and only the referenced ranges are read.
+            #  Formula cells are read as their cached values like calamine does
             # reader = pd.ExcelReader(stream_lookup['workbook.xlsx'])
+            workbook = stack.enter_context(closing(
+                load_workbook(stream_lookup['workbook.xlsx'], read_only=True, data_only=True)))
 
             sheets = [workbook[name] for name in workbook.sheetnames]
-            # native_tables = [table for sheet in sheets for table in sheet.tables.values()]
             table_definitions.extend([
                 ExcelTableDefinition.from_native_table(
                     table,
                     sheet
                 )
                 for sheet in sheets
-                for table in sheet.tables.values()
+                for table in native_tables.get(sheet.title, [])
             ])
 
             if 'table_def.yaml' in stream_lookup:
@@ -260,17 +721,13 @@ class ExcelDataSourcePlugin(DataSourcePlugin):
                     )
                     for definition in parsed_definitions
                 ])
-            datetime_types = [
-                'datetime64[ns]', # 'datetime64[ns,tz]',
-                'datetime64[ms]', 'datetime64[s]',
-                'datetime64[m]', 'datetime64[h]'
-            ]
+            if engine == 'calamine':
+                table_definitions = self._use_calamine(stream_lookup['workbook.xlsx'], table_definitions)
+
             for definition in table_definitions:
-                frame = definition.get_frame()
+                frame = definition.get_frame(sampling)
                 for col in frame.select_dtypes(include='datetime64').columns:
-                    frame[col] = frame[col].apply(
-                        lambda val: val.isoformat() if isinstance(val, pd.Timestamp) else val
-                    ).astype('object').replace({pd.NaT: None})
+                    frame[col] = isoformat_datetime_column(frame[col])
                 tables[definition.table_name] = frame
 
         return tables
@@ -278,8 +735,15 @@ class ExcelDataSourcePlugin(DataSourcePlugin):
     def get_strong_entities(self, name: str) -> List[Entity]:
         pass
 
+    def get_sampling_settings(self, name: str) -> ExcelSamplingSettings:
+        with self.storage.get_data(name) as stream_lookup:
+            if 'sampling.yaml' not in stream_lookup:
+                return ExcelSamplingSettings()
+            return ExcelSamplingSettings(**(yaml.safe_load(stream_lookup['sampling.yaml']) or {}))
+
     def get_all_entities(self, name: str) -> List[Entity]:
-        tables = self._get_tables(name)
+        # Only the attribute names end up in the model, so a bounded sample of each table is enough for the schema
+        tables = self._get_tables(name, self.get_sampling_settings(name), self.get_excel_engine(name))
         obj = {
             key: frame.to_dict(orient='records')
             for key, frame in tables.items()
@@ -0,0 +1,73 @@
+import datetime
+import time
+import warnings
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableColumn
+
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_tabular import ExcelDataSourcePlugin, excel_engines
+
+
+def create_synthetic_workbook(path: Path, row_count: int, column_count: int = 10):
+    # Write only mode keeps the generation of large workbooks in bounded memory
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Data')
+    column_names = [f'column_{index}' for index in range(column_count)]
+    worksheet.append(column_names)
+    start = datetime.datetime(2020, 1, 1)
+    for row_index in range(row_count):
+        worksheet.append([
+            row_index if column_index % 3 == 0 else
+            start + datetime.timedelta(minutes=row_index) if column_index % 3 == 1 else
+            f'value {row_index} {column_index}'
+            for column_index in range(column_count)
+        ])
+    table = Table(displayName='Data', ref=f'A1:{get_column_letter(column_count)}{row_count + 1}')
+    # Write only worksheets do not initialise the table columns from the header cells, so they are set here and the
+    #  corresponding warning is silenced
+    table.tableColumns = [TableColumn(id=index + 1, name=name) for index, name in enumerate(column_names)]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        worksheet.add_table(table)
+    workbook.save(path)
+
+
+def benchmark_engine(workbook_path: Path, engine: str, repetitions: int) -> List[float]:
+    storage = ManualFilesystemDataSourceStorage({'synthetic': ('Excel', {'workbook.xlsx': workbook_path})})
+    durations = []
+    for _ in range(repetitions):
+        plugin = ExcelDataSourcePlugin(storage, lambda *args, **kwargs: '')
+        start = time.perf_counter()
+        # All rows are read, so the sampling of the schema inference does not hide the reading costs
+        tables = plugin._get_tables('synthetic', engine=engine)
+        durations.append(time.perf_counter() - start)
+        assert len(tables['Data']) > 0
+    return durations
+
+
+def main():
+    parser = ArgumentParser(description='Times the reading of all table rows of synthetic workbooks per Excel engine')
+    parser.add_argument('row_counts', metavar='<row-count>', type=int, nargs='*', default=[10000, 100000])
+    parser.add_argument('--column-count', type=int, default=10)
+    parser.add_argument('--engines', nargs='*', choices=excel_engines, default=excel_engines)
+    parser.add_argument('--repetitions', type=int, default=3)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        for row_count in args.row_counts:
+            workbook_path = Path(directory) / f'synthetic-{row_count}.xlsx'
+            create_synthetic_workbook(workbook_path, row_count, args.column_count)
+            for engine in args.engines:
+                durations = benchmark_engine(workbook_path, engine, args.repetitions)
+                print(f'{row_count:>8} rows {engine:>9}: best {min(durations):8.3f}s, '
+                      f'mean {sum(durations) / len(durations):8.3f}s over {len(durations)} runs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+from io import BytesIO
+from pathlib import Path
+from typing import Dict
+from zipfile import ZipFile
+
+import pytest
+
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_tabular import (TabularDataSourcePlugin, CsvProfilingSettings, profile_csv_members,
+                                    extract_csv_columns)
+
+
+def make_plugin(tmp_path: Path, csv_files: Dict[str, str], input_name: str = 'data_header',
+                **extra_inputs: str) -> TabularDataSourcePlugin:
+    input_paths = {input_name: tmp_path / f'{input_name}.zip'}
+    with ZipFile(input_paths[input_name], 'w') as zip_handle:
+        for file_name, content in csv_files.items():
+            zip_handle.writestr(file_name, content)
+    for input_name, content in extra_inputs.items():
+        input_paths[input_name] = tmp_path / input_name
+        input_paths[input_name].write_text(content)
+    storage = ManualFilesystemDataSourceStorage({'bundle': ('Tabular', input_paths)})
+    return TabularDataSourcePlugin(storage, lambda *args, **kwargs: '')
+
+
+def make_csv(header: str, rows) -> str:
+    return '\n'.join([header, *[','.join(str(x) for x in row) for row in rows]]) + '\n'
+
+
+@pytest.fixture
+def csv_files():
+    return {
+        'a.csv': make_csv('id,name', [(index, f'name {index}') for index in range(1, 21)]),
+        'b.csv': make_csv('id,a_id,qty', [(index, index % 20 + 1, index % 5 + 1) for index in range(1, 41)]),
+        'c.csv': make_csv('code,b_id,parent_c', [(f'C{index}', index, f'C{index // 2}') for index in range(1, 11)]),
+        'empty.csv': ''
+    }
+
+
+def get_relations(plugin: TabularDataSourcePlugin):
+    return {
+        relation.relation_name[0]: relation
+        for entity in plugin.get_all_entities('bundle')
+        for relation in entity.is_subject_in_relation
+    }
+
+
+def test_csv_profiling_keys(tmp_path, csv_files):
+    plugin = make_plugin(tmp_path, csv_files, **{'profiling.yaml': 'chunk_size: 7\nmax_workers: 1'})
+    entity_lookup = {x.entity_name[0]: x for x in plugin.get_all_entities('bundle')}
+
+    assert entity_lookup['empty'].has_attribute == []
+    key_lookup = {
+        attribute.attribute_name[0]: bool(attribute.has_attribute_modifier)
+        for attribute in entity_lookup['b'].has_attribute
+    }
+    assert key_lookup == {'b_id': True, 'b_a_id': False, 'b_qty': False}
+
+
+def test_csv_profiling_foreign_keys(tmp_path, csv_files):
+    # parent_c has the C0 value which is not a code, so only the name based candidates remain
+    relations = get_relations(make_plugin(tmp_path, csv_files, **{'profiling.yaml': 'max_workers: 1'}))
+
+    assert sorted(relations.keys()) == ['b_a_id_a', 'c_b_id_b']
+    assert relations['b_a_id_a'].subject_cardinality.cardinality == 'any'
+    assert relations['c_b_id_b'].object_cardinality.cardinality == 'exactlyOne'
+
+
+def test_csv_profiling_self_reference_by_name(tmp_path, csv_files):
+    csv_files['c.csv'] = make_csv(
+        'code,b_id,parent_c',
+        [(f'C{index}', index, f'C{index // 2 + 1}') for index in range(1, 11)]
+    )
+    relations = get_relations(make_plugin(tmp_path, csv_files, **{'profiling.yaml': 'max_workers: 1'}))
+
+    assert sorted(relations.keys()) == ['b_a_id_a', 'c_b_id_b', 'c_parent_c_c']
+
+
+def test_csv_profiling_key_check_beyond_exact_limit(tmp_path, csv_files):
+    # The duplicate of the first value is only found by the sketch once the exact check has stopped
+    csv_files['d.csv'] = make_csv('id', [(index,) for index in [*range(1, 101), 1]])
+    settings = 'chunk_size: 10\nmax_key_hashes: 20\nmax_workers: 1'
+    entity_lookup = {
+        x.entity_name[0]: x
+        for x in make_plugin(tmp_path, csv_files, **{'profiling.yaml': settings}).get_all_entities('bundle')
+    }
+
+    assert not entity_lookup['d'].has_attribute[0].has_attribute_modifier
+    assert entity_lookup['a'].has_attribute[0].has_attribute_modifier
+
+
+def test_csv_profiling_in_worker_processes(tmp_path, csv_files):
+    sequential_relations = get_relations(make_plugin(tmp_path, csv_files, **{'profiling.yaml': 'max_workers: 1'}))
+    parallel_relations = get_relations(make_plugin(tmp_path, csv_files, **{'profiling.yaml': 'max_workers: 2'}))
+    assert parallel_relations == sequential_relations
+
+    # Streams without a file are copied to a temp file for the worker processes
+    zip_stream = BytesIO((tmp_path / 'data_header.zip').read_bytes())
+    parallel_profiles = profile_csv_members(zip_stream, True, CsvProfilingSettings(max_workers=2))
+    sequential_profiles = profile_csv_members(zip_stream, True, CsvProfilingSettings(max_workers=1))
+    assert list(parallel_profiles.keys()) == ['a', 'b', 'c', 'empty']
+    def summarize(profile_lookup):
+        return [[(x.name, x.column_type, x.is_candidate_key) for x in profiles] for profiles in profile_lookup.values()]
+
+    assert summarize(parallel_profiles) == summarize(sequential_profiles)
+
+
+def test_csv_columns_read_only_the_first_row():
+    stream = BytesIO()
+    with ZipFile(stream, 'w') as zip_handle:
+        zip_handle.writestr('a.csv', make_csv('id,"name, full"', [(1, 'x')]))
+        # Rows after the header are never decoded, so the invalid bytes far behind it do not matter
+        zip_handle.writestr('b.csv', b'id,value\n' + b'1,2\n' * 100000 + b'\xff\xfe\n')
+        zip_handle.writestr('empty.csv', '')
+        zip_handle.writestr('nested/c.csv', 'id\n')
+        zip_handle.writestr('notes.txt', 'id\n')
+    stream.seek(0)
+
+    assert extract_csv_columns(stream, has_header=True) == {
+        'a': ['id', 'name, full'], 'b': ['id', 'value'], 'empty': []
+    }
+    stream.seek(0)
+    assert extract_csv_columns(stream, has_header=False)['a'] == ['Column0', 'Column1']
+
+
+def test_csv_entities_without_header_and_profiling(tmp_path):
+    csv_files = {'a.csv': '1,name 1,x\n2,name 2,y\n', 'empty.csv': ''}
+    entity_lookup = {
+        x.entity_name[0]: x
+        for x in make_plugin(tmp_path, csv_files, input_name='data_no_header').get_all_entities('bundle')
+    }
+
+    assert sorted(entity_lookup.keys()) == ['a', 'empty']
+    assert [x.attribute_name[0] for x in entity_lookup['a'].has_attribute] == ['a_Column0', 'a_Column1', 'a_Column2']
+    assert all(x.has_attribute_modifier == [] for x in entity_lookup['a'].has_attribute)
+    assert entity_lookup['empty'].has_attribute == []
@@ -0,0 +1,148 @@
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from zipfile import ZipFile
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from openpyxl.worksheet.table import Table
+
+from simpler_core.storage import ManualFilesystemDataSourceStorage
+from simpler_plugin_tabular import (ExcelDataSourcePlugin, ExcelSamplingSettings, get_native_tables,
+                                    isoformat_datetime_column)
+
+
+def make_plugin(tmp_path: Path, workbook: Workbook) -> ExcelDataSourcePlugin:
+    workbook_path = tmp_path / 'workbook.xlsx'
+    workbook.save(workbook_path)
+    storage = ManualFilesystemDataSourceStorage({'workbook': ('Excel', {'workbook.xlsx': workbook_path})})
+    return ExcelDataSourcePlugin(storage, lambda *args, **kwargs: '')
+
+
+@pytest.fixture
+def workbook() -> Workbook:
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Data'
+    worksheet.append(['id', 'name', 'amount'])
+    for index in range(1, 4):
+        worksheet.append([index, f'name {index}', index * 1.5])
+    # The table range reaches two rows below the last used row of the sheet
+    worksheet.add_table(Table(displayName='Items', ref='A1:C6'))
+    workbook.create_sheet('Empty')
+    return workbook
+
+
+def test_excel_native_table_below_used_range(tmp_path, workbook):
+    tables = make_plugin(tmp_path, workbook)._get_tables('workbook', engine='openpyxl')
+
+    assert list(tables.keys()) == ['Items']
+    assert list(tables['Items'].columns) == ['id', 'name', 'amount']
+    assert tables['Items']['id'].tolist()[:3] == [1, 2, 3]
+    assert len(tables['Items']) == 5
+    assert tables['Items'].iloc[3:].isna().all(axis=None)
+
+
+def test_excel_engines_agree_on_formula_cells(tmp_path, workbook):
+    worksheet = workbook['Data']
+    worksheet['D1'] = 'double'
+    for row in range(2, 5):
+        worksheet[f'D{row}'] = f'=A{row}*2'
+    worksheet.tables['Items'].ref = 'A1:D6'
+    plugin = make_plugin(tmp_path, workbook)
+    # openpyxl writes no cached values, one is added for the first formula cell
+    workbook_path = tmp_path / 'workbook.xlsx'
+    with ZipFile(workbook_path) as archive:
+        parts = {x.filename: archive.read(x.filename) for x in archive.infolist()}
+    sheet_part = 'xl/worksheets/sheet1.xml'
+    parts[sheet_part] = parts[sheet_part].replace(b'<f>A2*2</f><v />', b'<f>A2*2</f><v>2</v>')
+    with ZipFile(workbook_path, 'w') as archive:
+        for part_name, content in parts.items():
+            archive.writestr(part_name, content)
+
+    openpyxl_tables = plugin._get_tables('workbook', engine='openpyxl')
+    calamine_tables = plugin._get_tables('workbook', engine='calamine')
+
+    assert openpyxl_tables['Items']['double'].iloc[0] == 2
+    assert openpyxl_tables['Items']['double'].iloc[1:].isna().all()
+    pd.testing.assert_frame_equal(openpyxl_tables['Items'], calamine_tables['Items'])
+
+
+def test_excel_native_tables_of_several_sheets(workbook):
+    worksheet = workbook.create_sheet('More')
+    worksheet.append(['key', 'value', None, 'code'])
+    worksheet.append([1, 'a', None, 'x'])
+    worksheet.add_table(Table(displayName='Pairs', ref='A1:B2'))
+    worksheet.add_table(Table(displayName='Codes', ref='D1:D2'))
+    stream = BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+
+    tables = get_native_tables(stream)
+
+    assert {name: [x.name for x in sheet_tables] for name, sheet_tables in tables.items()} == {
+        'Data': ['Items'], 'Empty': [], 'More': ['Pairs', 'Codes']
+    }
+    assert tables['More'][1].ref == 'D1:D2'
+    assert stream.tell() == 0
+
+
+@pytest.mark.parametrize('sampling, positions', [
+    (ExcelSamplingSettings(strategy='first', row_count=3), [0, 1, 2]),
+    (ExcelSamplingSettings(strategy='stratified', row_count=3), [0, 5, 10]),
+    (ExcelSamplingSettings(strategy='stratified', row_count=4), [0, 3, 7, 10]),
+    (ExcelSamplingSettings(strategy='all', row_count=3), list(range(11))),
+    (ExcelSamplingSettings(strategy='first', row_count=None), list(range(11))),
+    (ExcelSamplingSettings(strategy='stratified', row_count=20), list(range(11))),
+])
+def test_excel_sampling_positions(sampling, positions):
+    assert list(sampling.select_positions(11)) == positions
+
+
+def test_excel_sampling_of_native_table(tmp_path, workbook):
+    worksheet = workbook['Data']
+    for index in range(4, 11):
+        worksheet.append([index, f'name {index}', index * 1.5])
+    worksheet.tables['Items'].ref = 'A1:C11'
+    plugin = make_plugin(tmp_path, workbook)
+
+    sampling = ExcelSamplingSettings(strategy='stratified', row_count=4)
+
+    for engine in ['openpyxl', 'calamine']:
+        frame = plugin._get_tables('workbook', sampling, engine)['Items']
+        full_frame = plugin._get_tables('workbook', engine=engine)['Items']
+        # The index keeps the sheet row numbers of the sampled rows
+        assert frame.index.tolist() == [2, 5, 8, 11]
+        assert frame['id'].tolist() == [1, 4, 7, 10]
+        pd.testing.assert_frame_equal(frame, full_frame.loc[[2, 5, 8, 11]])
+
+
+def test_isoformat_datetime_column():
+    column = pd.Series([pd.Timestamp('2024-01-02 03:04:05'), pd.NaT, pd.Timestamp('2024-01-02 03:04:05.000678')])
+    # Same strings as Timestamp.isoformat
+    expected = [None if x is pd.NaT else x.isoformat() for x in column]
+
+    assert isoformat_datetime_column(column).tolist() == expected
+    assert expected == ['2024-01-02T03:04:05', None, '2024-01-02T03:04:05.000678']
+
+
+def test_excel_datetime_and_mixed_columns(tmp_path, workbook):
+    worksheet = workbook['Data']
+    worksheet['D1'] = 'created'
+    worksheet['E1'] = 'mixed'
+    for row, created, mixed in [
+        (2, datetime(2024, 1, 2, 3, 4, 5), datetime(2024, 1, 2)),
+        (3, None, 'unknown'),
+        (4, datetime(2024, 1, 3), 5)
+    ]:
+        worksheet[f'D{row}'] = created
+        worksheet[f'E{row}'] = mixed
+    worksheet.tables['Items'].ref = 'A1:E4'
+    plugin = make_plugin(tmp_path, workbook)
+
+    for engine in ['openpyxl', 'calamine']:
+        frame = plugin._get_tables('workbook', engine=engine)['Items']
+        # Only datetime columns are formatted, columns mixing datetimes with other values keep their values
+        assert frame['created'].tolist() == ['2024-01-02T03:04:05', None, '2024-01-03T00:00:00']
+        assert frame['mixed'].tolist() == [datetime(2024, 1, 2), 'unknown', 5]